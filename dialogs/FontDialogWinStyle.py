@@ -1,24 +1,81 @@
-from PyQt5.QtWidgets import QDialog, QLabel, QListWidget, QPushButton, QVBoxLayout, QHBoxLayout, QGridLayout
+from PyQt5.QtWidgets import (
+    QDialog, QLabel, QListWidget, QListView, QLineEdit, QCheckBox, QPushButton,
+    QVBoxLayout, QHBoxLayout, QGridLayout
+)
+from PyQt5.QtCore import Qt, QTimer, QAbstractListModel, QModelIndex
 from PyQt5.QtGui import QFont, QFontDatabase
 
+from features.font_catalog import font_catalog
+
+DEFAULT_STYLES = ["Regular", "Italic", "Bold", "Bold Italic"]
+# what fonts call their upright, normal weight style
+PLAIN_STYLES = ("Regular", "Normal", "Book", "Roman", "Medium")
+
+
+class FontListModel(QAbstractListModel):
+    # The families of the shared font catalog that pass the filter. Names
+    # starting with the filter text come first, then names containing it.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries = []
+        self.rows = []
+
+    def set_entries(self, entries):
+        self.entries = entries
+
+    def set_filter(self, text, monospace_only):
+        text = text.strip().lower()
+        entries = [e for e in self.entries if e.monospace] if monospace_only else self.entries
+        if text:
+            prefix = [e for e in entries if e.key.startswith(text)]
+            inside = [e for e in entries if text in e.key and not e.key.startswith(text)]
+            entries = prefix + inside
+        self.beginResetModel()
+        self.rows = entries
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return entry.family
+        if role == Qt.ToolTipRole and entry.monospace:
+            return "Monospace"
+        return None
+
+    def row_of(self, family):
+        key = family.lower()
+        for i, entry in enumerate(self.rows):
+            if entry.key == key:
+                return i
+        return -1
+
+
 class FontDialogWinStyle(QDialog):
     def __init__(self, parent, current_font, apply_callback):
         super().__init__(parent)
         self.setWindowTitle("Font")
         self.setModal(True)
         self.apply_callback = apply_callback
-        self.setFixedSize(520, 340)
+        self.setFixedSize(520, 380)
 
         # Font list, style list, size list
-        self.font_list = QListWidget()
+        self.font_model = FontListModel(self)
+        self.font_list = QListView()
+        self.font_list.setModel(self.font_model)
+        self.font_list.setUniformItemSizes(True)
+        self.font_filter = QLineEdit()
+        self.font_filter.setPlaceholderText("Filter fonts")
+        self.font_filter.setClearButtonEnabled(True)
+        self.monospace_only = QCheckBox("Monospace only")
         self.style_list = QListWidget()
         self.size_list = QListWidget()
 
-        font_db = QFontDatabase()
-        self.font_names = font_db.families()
-        self.font_list.addItems(sorted(self.font_names))
-
-        self.font_styles = ["Regular", "Italic", "Bold", "Bold Italic"]
+        self.font_styles = list(DEFAULT_STYLES)
         self.style_list.addItems(self.font_styles)
 
         self.font_sizes = [str(i) for i in range(8, 33)]
@@ -62,9 +119,11 @@ class FontDialogWinStyle(QDialog):
         grid.addWidget(QLabel("Style:"), 0, 1)
         grid.addWidget(QLabel("Size:"), 0, 2)
 
-        grid.addWidget(self.font_list, 1, 0)
-        grid.addWidget(self.style_list, 1, 1)
-        grid.addWidget(self.size_list, 1, 2)
+        grid.addWidget(self.font_filter, 1, 0)
+        grid.addWidget(self.font_list, 2, 0)
+        grid.addWidget(self.style_list, 1, 1, 2, 1)
+        grid.addWidget(self.size_list, 1, 2, 2, 1)
+        grid.addWidget(self.monospace_only, 3, 0)
 
         grid.setColumnStretch(0, 3)
         grid.setColumnStretch(1, 2)
@@ -82,54 +141,120 @@ class FontDialogWinStyle(QDialog):
         self.setLayout(vbox)
         vbox.setContentsMargins(10, 10, 10, 10)
 
-        # Select current font
-        current_family = current_font.family()
-        current_size = str(current_font.pointSize())
-        current_weight = "Bold" if current_font.bold() else "Regular"
-        current_style = "Italic" if current_font.italic() else "Regular"
+        # the preview is rendered once the selection settles
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(60)
+        self._preview_timer.timeout.connect(self.update_preview)
 
-        # Set selection
-        if current_family in self.font_names:
-            self.font_list.setCurrentRow(self.font_names.index(current_family))
+        # Signals
+        self.font_filter.textChanged.connect(self.apply_filter)
+        self.font_filter.returnPressed.connect(self.font_list.setFocus)
+        self.monospace_only.toggled.connect(self.apply_filter)
+        self.font_list.selectionModel().currentChanged.connect(self._on_family_changed)
+        self.style_list.currentTextChanged.connect(self._preview_timer.start)
+        self.size_list.currentTextChanged.connect(self._preview_timer.start)
+
+        self.ok_button.clicked.connect(self.on_ok)
+        self.cancel_button.clicked.connect(self.reject)
+
+        # the catalog is shared by every dialog and read from QFontDatabase
+        # only once; the first time, it may still be loading on a worker
+        self.catalog = font_catalog()
+        self.catalog.ready.connect(self._on_catalog_ready)
+        self.catalog.load()
+        self.select_font(current_font)
+
+    def select_font(self, font):
+        self._family = font.family()
+        current_size = str(font.pointSize())
         if current_size in self.font_sizes:
             self.size_list.setCurrentRow(self.font_sizes.index(current_size))
         # Determine combined style
         style_name = "Regular"
-        if current_font.bold() and current_font.italic():
+        if font.bold() and font.italic():
             style_name = "Bold Italic"
-        elif current_font.bold():
+        elif font.bold():
             style_name = "Bold"
-        elif current_font.italic():
+        elif font.italic():
             style_name = "Italic"
-        self.style_list.setCurrentRow(self.font_styles.index(style_name))
+        self._style = style_name
+        self.sample_label.setFont(font)
 
-        # Signals
-        self.font_list.currentTextChanged.connect(self.update_preview)
-        self.style_list.currentTextChanged.connect(self.update_preview)
-        self.size_list.currentTextChanged.connect(self.update_preview)
+        if self.catalog.loaded:
+            self.font_model.set_entries(self.catalog.entries)
+            self.font_filter.clear()
+            self.apply_filter()
+        else:
+            self.font_list.setEnabled(False)
+            self.font_filter.setPlaceholderText("Loading fonts...")
+        self._set_styles(self._style)
 
-        self.ok_button.clicked.connect(self.on_ok)
-        self.cancel_button.clicked.connect(self.reject)
+    def _on_catalog_ready(self):
+        if self.font_model.entries is self.catalog.entries:
+            return
+        self.font_list.setEnabled(True)
+        self.font_filter.setPlaceholderText("Filter fonts")
+        self.font_model.set_entries(self.catalog.entries)
+        self.apply_filter()
 
-        # Initial preview
-        self.update_preview()
+    def apply_filter(self):
+        self.font_model.set_filter(self.font_filter.text(), self.monospace_only.isChecked())
+        # keep the chosen family selected while it passes the filter
+        row = self.font_model.row_of(self._family)
+        if row < 0 and self.font_filter.text().strip() and self.font_model.rows:
+            row = 0
+        if row >= 0:
+            index = self.font_model.index(row)
+            self.font_list.setCurrentIndex(index)
+            self.font_list.scrollTo(index, QListView.PositionAtCenter)
 
-    def update_preview(self):
-        family = self.font_list.currentItem().text() if self.font_list.currentItem() else "Arial"
+    def _on_family_changed(self, current, previous):
+        if not current.isValid():
+            return
+        entry = self.font_model.rows[current.row()]
+        self._family = entry.family
+        self._set_styles(self.style_list.currentItem().text() if self.style_list.currentItem() else self._style)
+        self._preview_timer.start()
+
+    def _set_styles(self, wanted):
+        # the styles this family really has, for fonts that report none
+        # the four synthesized ones
+        row = self.font_model.row_of(self._family)
+        styles = list(self.font_model.rows[row].styles) if row >= 0 else []
+        styles = styles or list(DEFAULT_STYLES)
+        if styles != self.font_styles:
+            self.font_styles = styles
+            self.style_list.blockSignals(True)
+            self.style_list.clear()
+            self.style_list.addItems(styles)
+            self.style_list.blockSignals(False)
+        if wanted not in styles:
+            wanted = next((name for name in PLAIN_STYLES if name in styles), styles[0])
+        self.style_list.setCurrentRow(styles.index(wanted))
+
+    def selected_font(self):
         size = int(self.size_list.currentItem().text()) if self.size_list.currentItem() else 12
         style = self.style_list.currentItem().text() if self.style_list.currentItem() else "Regular"
+        return self._family, size, style
 
-        weight = QFont.Bold if "Bold" in style else QFont.Normal
-        italic = True if "Italic" in style else False
-
-        font = QFont(family, size, weight)
-        font.setItalic(italic)
-        self.sample_label.setFont(font)
+    def update_preview(self):
+        family, size, style = self.selected_font()
+        self.sample_label.setFont(font_for(family, style, size))
 
     def on_ok(self):
-        family = self.font_list.currentItem().text()
-        size = int(self.size_list.currentItem().text())
-        style = self.style_list.currentItem().text()
-
+        family, size, style = self.selected_font()
         self.apply_callback(family, size, style)
         self.accept()
+
+
+def font_for(family, style, size):
+    # styles from the catalog ("Light", "Condensed Bold") resolve through
+    # QFontDatabase, the synthesized ones set weight and slant directly
+    if style not in DEFAULT_STYLES:
+        font = QFontDatabase().font(family, style, size)
+        if font.family().lower() == family.lower():
+            return font
+    font = QFont(family, size, QFont.Bold if "Bold" in style else QFont.Normal)
+    font.setItalic("Italic" in style)
+    return font
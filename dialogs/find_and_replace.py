@@ -1,15 +1,24 @@
 from PyQt5.QtWidgets import QDialog, QLabel, QLineEdit, QCheckBox, QPushButton, QTextEdit, QVBoxLayout, QHBoxLayout, QGridLayout, QMessageBox
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer, QPoint
+from PyQt5.QtGui import QTextCursor, QTextCharFormat, QColor
+from bisect import bisect_left, bisect_right
+import re
+
+from features.search_engine import PositionMap, SearchThread, build_pattern
+
 
 class FindReplaceDialog(QDialog):
+    # at most this many matches are painted, and only inside the viewport
+    MAX_HIGHLIGHTS = 2000
+
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
-        self.text_area = parent.text_area  # QTextEdit của PyPadQt
+        self.text_area = parent.text_area  # CodeEditor của PyPadQt
 
         self.setWindowTitle("Find & Replace")
         self.setModal(False)
-        self.resize(400, 150)
+        self.resize(420, 170)
 
         # --- Widgets ---
         self.find_label = QLabel("Find what:")
@@ -18,10 +27,14 @@ class FindReplaceDialog(QDialog):
         self.replace_entry = QLineEdit()
 
         self.match_case_cb = QCheckBox("Match case")
+        self.whole_word_cb = QCheckBox("Whole word")
+        self.regex_cb = QCheckBox("Regex")
         self.wrap_around_cb = QCheckBox("Wrap around")
         self.wrap_around_cb.setChecked(True)
+        self.count_label = QLabel("")
 
         self.find_next_btn = QPushButton("Find Next")
+        self.find_prev_btn = QPushButton("Find Previous")
         self.replace_btn = QPushButton("Replace")
         self.replace_all_btn = QPushButton("Replace All")
         self.cancel_btn = QPushButton("Cancel")
@@ -30,61 +43,332 @@ class FindReplaceDialog(QDialog):
         grid = QGridLayout()
         grid.addWidget(self.find_label, 0, 0)
         grid.addWidget(self.find_entry, 0, 1, 1, 3)
+        grid.addWidget(self.count_label, 0, 4)
         grid.addWidget(self.replace_label, 1, 0)
         grid.addWidget(self.replace_entry, 1, 1, 1, 3)
         grid.addWidget(self.match_case_cb, 2, 0)
-        grid.addWidget(self.wrap_around_cb, 2, 1)
+        grid.addWidget(self.whole_word_cb, 2, 1)
+        grid.addWidget(self.regex_cb, 2, 2)
+        grid.addWidget(self.wrap_around_cb, 2, 3)
         grid.addWidget(self.find_next_btn, 3, 0)
-        grid.addWidget(self.replace_btn, 3, 1)
-        grid.addWidget(self.replace_all_btn, 3, 2)
-        grid.addWidget(self.cancel_btn, 3, 3)
+        grid.addWidget(self.find_prev_btn, 3, 1)
+        grid.addWidget(self.replace_btn, 3, 2)
+        grid.addWidget(self.replace_all_btn, 3, 3)
+        grid.addWidget(self.cancel_btn, 3, 4)
 
         self.setLayout(grid)
 
+        # --- Search state ---
+        self.pattern = None
+        self.match_starts = []
+        self.match_lengths = []
+        self.current_match = -1
+        self.search_complete = False
+        self._job_id = 0
+        self._threads = []
+        self._snapshot = None
+        self._pending_step = 0
+
+        # re-search once typing in the find box (or the document) pauses
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(150)
+        self._search_timer.timeout.connect(self.start_search)
+
         # --- Signals ---
         self.find_next_btn.clicked.connect(self.find_next)
+        self.find_prev_btn.clicked.connect(self.find_previous)
         self.replace_btn.clicked.connect(self.replace)
         self.replace_all_btn.clicked.connect(self.replace_all)
         self.cancel_btn.clicked.connect(self.hide)
+        self.find_entry.textChanged.connect(self._schedule_search)
+        self.find_entry.returnPressed.connect(self.find_next)
+        for cb in (self.match_case_cb, self.whole_word_cb, self.regex_cb):
+            cb.stateChanged.connect(self._schedule_search)
+
+        self._document = None
+        self.document_switched()
+        self.text_area.verticalScrollBar().valueChanged.connect(self._update_highlights)
+        self.text_area.horizontalScrollBar().valueChanged.connect(self._update_highlights)
 
         # Highlight format
-        self.highlight_format = self.text_area.currentCharFormat()
+        self.highlight_format = QTextCharFormat()
         self.highlight_format.setBackground(Qt.yellow)
+        self.current_format = QTextCharFormat()
+        self.current_format.setBackground(QColor("#ff9632"))
+
+    # --- Search index ---
+
+    def _schedule_search(self):
+        self._search_timer.start()
+
+    def document_switched(self):
+        # the editor shows another tab's document now, search that one
+        if self._document is not None:
+            try:
+                self._document.contentsChange.disconnect(self._on_document_changed)
+            except (TypeError, RuntimeError):
+                pass  # already deleted with its tab
+        self._document = self.text_area.document()
+        self._document.contentsChange.connect(self._on_document_changed)
+        self._snapshot = None
+        self._cancel_search()
+        self.match_starts = []
+        self.match_lengths = []
+        self.current_match = -1
+        self.search_complete = False
+        if self.isVisible() and self.find_entry.text():
+            self._update_highlights()
+            self._schedule_search()
+
+    def _on_document_changed(self, position, removed, added):
+        self._snapshot = None
+        if self.isVisible() and self.pattern is not None:
+            self._cancel_search()
+            self.match_starts = []
+            self.match_lengths = []
+            self.current_match = -1
+            self._update_highlights()
+            self._schedule_search()
+
+    def _cancel_search(self):
+        self._job_id += 1
+        for thread in self._threads:
+            thread.cancel()
+
+    def start_search(self):
+        self._cancel_search()
+        self.match_starts = []
+        self.match_lengths = []
+        self.current_match = -1
+        self.search_complete = False
+
+        query = self.find_entry.text()
+        if not query:
+            self.pattern = None
+            self.count_label.setText("")
+            self._update_highlights()
+            return
+        try:
+            self.pattern = build_pattern(
+                query,
+                regex=self.regex_cb.isChecked(),
+                whole_word=self.whole_word_cb.isChecked(),
+                match_case=self.match_case_cb.isChecked(),
+            )
+        except re.error as e:
+            self.pattern = None
+            self.count_label.setText("Invalid pattern")
+            self.count_label.setToolTip(str(e))
+            self._update_highlights()
+            return
+
+        # the snapshot is reused while only the query changes
+        if self._snapshot is None:
+            self._snapshot = self.text_area.toPlainText()
+
+        self.count_label.setToolTip("")
+        self.count_label.setText("Searching...")
+        thread = SearchThread(self._job_id, self._snapshot, self.pattern)
+        thread.matches_found.connect(self._on_matches_found)
+        thread.search_finished.connect(self._on_search_finished)
+        thread.finished.connect(lambda: self._threads.remove(thread))
+        self._threads.append(thread)
+        thread.start()
+
+    def _on_matches_found(self, job_id, starts, lengths):
+        if job_id != self._job_id:
+            return
+        self.match_starts.extend(starts)
+        self.match_lengths.extend(lengths)
+        self._update_count_label()
+        self._update_highlights()
+        if self._pending_step:
+            self._step(self._pending_step)
+
+    def _on_search_finished(self, job_id, total):
+        if job_id != self._job_id:
+            return
+        self.search_complete = True
+        self._update_count_label()
+        if self._pending_step:
+            self._step(self._pending_step)
+
+    def _update_count_label(self):
+        total = len(self.match_starts)
+        more = "" if self.search_complete else "+"
+        if total == 0:
+            self.count_label.setText("No results" if self.search_complete else "Searching...")
+        elif self.current_match >= 0:
+            self.count_label.setText(f"{self.current_match + 1} of {total}{more}")
+        else:
+            self.count_label.setText(f"{total}{more} matches")
+
+    # --- Highlighting ---
+
+    def _visible_range(self):
+        viewport = self.text_area.viewport()
+        first = self.text_area.cursorForPosition(QPoint(0, 0)).position()
+        last = self.text_area.cursorForPosition(QPoint(viewport.width(), viewport.height())).position()
+        return first, last
+
+    def _update_highlights(self):
+        if not self.isVisible():
+            return
+        if not self.match_starts:
+            self.text_area.setExtraSelections([])
+            return
+
+        first, last = self._visible_range()
+        lo = max(0, bisect_left(self.match_starts, first) - 1)
+        hi = min(bisect_right(self.match_starts, last), lo + self.MAX_HIGHLIGHTS)
+
+        selections = []
+        doc = self.text_area.document()
+        for i in range(lo, hi):
+            selection = QTextEdit.ExtraSelection()
+            cursor = QTextCursor(doc)
+            cursor.setPosition(self.match_starts[i])
+            cursor.setPosition(self.match_starts[i] + self.match_lengths[i], QTextCursor.KeepAnchor)
+            selection.cursor = cursor
+            selection.format = self.current_format if i == self.current_match else self.highlight_format
+            selections.append(selection)
+        self.text_area.setExtraSelections(selections)
+
+    # --- Navigation ---
 
     def find_next(self):
-        cursor = self.text_area.textCursor()
+        self._step(1)
+
+    def find_previous(self):
+        self._step(-1)
+
+    def _step(self, direction):
         find_text = self.find_entry.text()
         if not find_text:
             return
+        if self._search_timer.isActive() or (self.pattern is None and not self.search_complete):
+            self._search_timer.stop()
+            self.start_search()
+        if self.pattern is None:
+            self._pending_step = 0
+            return
+
+        cursor = self.text_area.textCursor()
+        starts = self.match_starts
+        if direction > 0:
+            index = bisect_left(starts, cursor.selectionEnd())
+        else:
+            index = bisect_left(starts, cursor.selectionStart()) - 1
+
+        if 0 <= index < len(starts):
+            self._pending_step = 0
+            self._select_match(index)
+            return
 
-        flags = QTextDocument.FindFlags()
-        if self.match_case_cb.isChecked():
-            flags |= QTextDocument.FindCaseSensitively
+        # the match may still be in the part of the document not scanned yet
+        if not self.search_complete:
+            self._pending_step = direction
+            return
+        self._pending_step = 0
 
-        found = self.text_area.find(find_text, flags)
-        if not found and self.wrap_around_cb.isChecked():
-            cursor.movePosition(QTextCursor.Start)
-            self.text_area.setTextCursor(cursor)
-            self.text_area.find(find_text, flags)
-        elif not found:
+        if starts and self.wrap_around_cb.isChecked():
+            self._select_match(0 if direction > 0 else len(starts) - 1)
+        else:
             QMessageBox.information(self, "Not Found", f"Cannot find '{find_text}'")
 
+    def _select_match(self, index):
+        self.current_match = index
+        cursor = self.text_area.textCursor()
+        cursor.setPosition(self.match_starts[index])
+        cursor.setPosition(self.match_starts[index] + self.match_lengths[index], QTextCursor.KeepAnchor)
+        self.text_area.setTextCursor(cursor)
+        self._update_count_label()
+        self._update_highlights()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.find_entry.text():
+            self._schedule_search()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._cancel_search()
+        self._pending_step = 0
+        self.text_area.setExtraSelections([])
+
+    def _build_pattern(self):
+        try:
+            return build_pattern(
+                self.find_entry.text(),
+                regex=self.regex_cb.isChecked(),
+                whole_word=self.whole_word_cb.isChecked(),
+                match_case=self.match_case_cb.isChecked(),
+            )
+        except re.error as e:
+            QMessageBox.warning(self, "Invalid pattern", str(e))
+            return None
+
+    def _check_replacement(self, pattern):
+        # a bad group reference or a trailing backslash is only found by
+        # expanding, check it once before any text is touched
+        if not self.regex_cb.isChecked():
+            return True
+        try:
+            pattern.sub(self.replace_entry.text(), "")
+        except (re.error, IndexError) as e:
+            QMessageBox.warning(self, "Invalid replacement", str(e))
+            return False
+        return True
+
+    def _replacement_for(self, match):
+        # regex mode understands \1 and \g<name>, plain mode inserts the text as is
+        if self.regex_cb.isChecked():
+            return match.expand(self.replace_entry.text())
+        return self.replace_entry.text()
+
     def replace(self):
         cursor = self.text_area.textCursor()
-        if cursor.hasSelection():
-            cursor.insertText(self.replace_entry.text())
+        if cursor.hasSelection() and self.find_entry.text():
+            pattern = self._build_pattern()
+            if pattern is None or not self._check_replacement(pattern):
+                return
+            match = pattern.fullmatch(cursor.selectedText().replace("\u2029", "\n"))
+            if match:
+                cursor.insertText(self._replacement_for(match))
         self.find_next()
 
     def replace_all(self):
-        find_text = self.find_entry.text()
-        replace_text = self.replace_entry.text()
-        if not find_text:
+        if not self.find_entry.text():
+            return
+        pattern = self._build_pattern()
+        if pattern is None or not self._check_replacement(pattern):
             return
+
         text = self.text_area.toPlainText()
-        if self.match_case_cb.isChecked():
-            new_text = text.replace(find_text, replace_text)
-        else:
-            import re
-            pattern = re.compile(re.escape(find_text), re.IGNORECASE)
-            new_text = pattern.sub(replace_text, text)
-        self.text_area.setPlainText(new_text)
+        positions = PositionMap(text)
+        edits = [
+            (positions.to_doc(m.start()), positions.to_doc(m.end()), self._replacement_for(m))
+            for m in pattern.finditer(text) if m.end() > m.start()
+        ]
+        if not edits:
+            QMessageBox.information(self, "Not Found", f"Cannot find '{self.find_entry.text()}'")
+            return
+
+        # one edit block: a single undo step and a single contentsChange, so
+        # only the blocks between the first and last match are re-highlighted.
+        # Back to front keeps the earlier offsets valid.
+        v_scroll = self.text_area.verticalScrollBar().value()
+        h_scroll = self.text_area.horizontalScrollBar().value()
+        cursor = QTextCursor(self.text_area.document())
+        cursor.beginEditBlock()
+        for start, end, replacement in reversed(edits):
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.KeepAnchor)
+            cursor.insertText(replacement)
+        cursor.endEditBlock()
+        self.text_area.verticalScrollBar().setValue(v_scroll)
+        self.text_area.horizontalScrollBar().setValue(h_scroll)
+
+        self._search_timer.stop()
+        self.count_label.setText(f"Replaced {len(edits)}")
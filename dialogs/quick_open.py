@@ -0,0 +1,88 @@
+from PyQt5.QtWidgets import QDialog, QLineEdit, QListWidget, QVBoxLayout, QLabel
+from PyQt5.QtCore import Qt, QTimer, QEvent
+import os
+
+from features.quick_open import QuickOpenMatcher
+
+
+class QuickOpenDialog(QDialog):
+    def __init__(self, parent, path_index):
+        super().__init__(parent)
+        self.parent = parent
+        self.path_index = path_index
+        self.matcher = QuickOpenMatcher(path_index)
+
+        self.setWindowTitle("Quick Open")
+        self.setModal(False)
+        self.resize(560, 360)
+
+        self.query_entry = QLineEdit()
+        self.query_entry.setPlaceholderText("Type a file name")
+        self.results_list = QListWidget()
+        self.status_label = QLabel("")
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.query_entry)
+        layout.addWidget(self.results_list)
+        layout.addWidget(self.status_label)
+        self.setLayout(layout)
+
+        # rank once typing pauses for a moment
+        self._match_timer = QTimer(self)
+        self._match_timer.setSingleShot(True)
+        self._match_timer.setInterval(30)
+        self._match_timer.timeout.connect(self.update_results)
+
+        self.query_entry.textChanged.connect(self._match_timer.start)
+        self.query_entry.returnPressed.connect(self.open_selected)
+        self.query_entry.installEventFilter(self)
+        self.results_list.itemActivated.connect(self.open_selected)
+        self.path_index.updated.connect(self._on_index_updated)
+
+    def eventFilter(self, obj, event):
+        # arrow keys move through the results while the focus stays in the entry
+        if obj is self.query_entry and event.type() == QEvent.KeyPress:
+            key = event.key()
+            if key in (Qt.Key_Down, Qt.Key_Up, Qt.Key_PageDown, Qt.Key_PageUp):
+                row = self.results_list.currentRow()
+                step = {Qt.Key_Down: 1, Qt.Key_Up: -1, Qt.Key_PageDown: 10, Qt.Key_PageUp: -10}[key]
+                last = self.results_list.count() - 1
+                self.results_list.setCurrentRow(max(0, min(last, row + step)))
+                return True
+        return super().eventFilter(obj, event)
+
+    def popup(self):
+        self.path_index.refresh_if_stale()
+        self.query_entry.selectAll()
+        self.update_results()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.query_entry.setFocus()
+
+    def _on_index_updated(self):
+        if self.isVisible():
+            self.update_results()
+
+    def update_results(self):
+        paths = self.matcher.match(self.query_entry.text())
+        self.results_list.setUpdatesEnabled(False)
+        self.results_list.clear()
+        self.results_list.addItems(paths)
+        self.results_list.setUpdatesEnabled(True)
+        if paths:
+            self.results_list.setCurrentRow(0)
+
+        if self.path_index.root is None:
+            self.status_label.setText("Open a folder first (File > Open Folder).")
+        elif self.path_index.loading and not self.path_index.paths:
+            self.status_label.setText("Indexing files...")
+        else:
+            self.status_label.setText(f"{len(self.path_index.paths)} files")
+
+    def open_selected(self):
+        item = self.results_list.currentItem()
+        if item is None or self.path_index.root is None:
+            return
+        self.hide()
+        self.parent.load_file_content(os.path.join(self.path_index.root, item.text()))
@@ -0,0 +1,195 @@
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal
+from features.file_loader import DECODE_ERRORS
+import os
+import tempfile
+import threading
+
+
+def _read_umask():
+    # os.umask can only be read by setting it, do it once before any
+    # worker thread creates files
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _read_umask()
+
+
+def atomic_write(file_path, text, encoding="utf-8", fsync=True):
+    # write to a temp file next to the target, then swap it in, a crash
+    # leaves either the old or the new file but never a truncated one.
+    # A symlink is written through, not replaced by a regular file
+    file_path = os.path.realpath(file_path)
+    directory = os.path.dirname(file_path)
+    fd, tmp_path = tempfile.mkstemp(prefix=".pypad-", suffix=".tmp", dir=directory)
+    try:
+        # undecodable bytes of the loaded file go back out unchanged
+        with os.fdopen(fd, "w", encoding=encoding, errors=DECODE_ERRORS) as f:
+            f.write(text)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        # mkstemp creates the file 0600, give it the mode open() would have
+        try:
+            mode = os.stat(file_path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        try:
+            os.chmod(tmp_path, mode)
+        except OSError:
+            pass
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+
+class AutoSaveWriter(QThread):
+    saved = pyqtSignal(str, int)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, fsync=True):
+        super().__init__()
+        self.fsync = fsync
+        # held for the whole write, a manual save takes it to stay ordered
+        self.write_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._stopped = False
+
+    def submit(self, file_path, text, encoding, revision):
+        # only the newest snapshot per file is kept
+        with self._cond:
+            self._pending[file_path] = (text, encoding, revision)
+            self._cond.notify()
+
+    def discard(self, file_path):
+        with self._cond:
+            self._pending.pop(file_path, None)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped and not self._pending:
+                    return
+            # the snapshot is taken only once we own write_lock: a manual save
+            # discards it before taking the lock, so an older snapshot can
+            # never be written after the manual save
+            with self.write_lock:
+                with self._cond:
+                    if not self._pending:
+                        continue
+                    file_path, (text, encoding, revision) = self._pending.popitem()
+                try:
+                    atomic_write(file_path, text, encoding, self.fsync)
+                except Exception as e:
+                    self.failed.emit(file_path, str(e))
+                    continue
+            self.saved.emit(file_path, revision)
+
+
+class AutoSaver(QObject):
+    # Saves the current tab's file once typing pauses for `debounce_ms`, or
+    # at most `max_delay_ms` after the first unsaved edit, and only when the
+    # document revision changed since the last save. Text is snapshotted on
+    # the GUI thread, encoding and writing happen on AutoSaveWriter.
+    def __init__(self, app, debounce_ms=1000, max_delay_ms=3000, fsync=True):
+        super().__init__(app)
+        self.app = app
+        self.enabled = False
+        self.max_delay_ms = max_delay_ms
+        self._saved_revision = None
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(debounce_ms)
+        self._debounce.timeout.connect(self.save_now)
+
+        self._deadline = QTimer(self)
+        self._deadline.setSingleShot(True)
+        self._deadline.timeout.connect(self.save_now)
+
+        self.writer = AutoSaveWriter(fsync)
+        self.writer.saved.connect(self._on_saved)
+        self.writer.failed.connect(self._on_failed)
+        self.writer.start()
+
+        app.text_area.textChanged.connect(self._on_text_changed)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if enabled:
+            self._on_text_changed()
+        else:
+            self._debounce.stop()
+            self._deadline.stop()
+
+    def mark_saved(self):
+        # called after a manual save of the current buffer
+        self._saved_revision = self.app.text_area.document().revision()
+        self._debounce.stop()
+        self._deadline.stop()
+
+    def document_switched(self):
+        # revisions are per document, the new tab starts unsaved-unknown;
+        # call save_now() before switching so the old tab's edits are written
+        self._saved_revision = None
+        self._debounce.stop()
+        self._deadline.stop()
+        self._on_text_changed()
+
+    def _on_text_changed(self):
+        if not self.enabled or not self.app.text_area.document().isModified():
+            return
+        self._debounce.start()
+        if not self._deadline.isActive():
+            self._deadline.start(self.max_delay_ms)
+
+    def save_now(self):
+        self._debounce.stop()
+        self._deadline.stop()
+        app = self.app
+        if not self.enabled or not app.file_path or app.buffer_is_partial():
+            return
+        doc = app.text_area.document()
+        revision = doc.revision()
+        if not doc.isModified() or revision == self._saved_revision:
+            return
+        self._saved_revision = revision
+        self.writer.submit(app.file_path, doc.toPlainText(), app.file_encoding, revision)
+
+    def _on_saved(self, file_path, revision):
+        # the tab may be in the background by now
+        doc = self.app.documents.find(file_path)
+        if doc is not None and doc.document is not None and doc.document.revision() == revision:
+            doc.document.setModified(False)
+
+    def _on_failed(self, file_path, message):
+        self._saved_revision = None
+        self.app.status_bar.showMessage(f"Auto-save failed: {message}", 5000)
+
+    def shutdown(self):
+        self.save_now()
+        self.writer.stop()
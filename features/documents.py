@@ -0,0 +1,147 @@
+from PyQt5.QtCore import QObject, QStandardPaths
+import itertools
+import json
+import os
+
+
+def _same_path(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class Document:
+    # One tab. `document` (with its highlighter, stats and journal) is None
+    # until the tab is first shown, and again after an unmodified tab was
+    # evicted; the file is read from disk the next time the tab is shown.
+    # Files over the large file threshold get `large_file_view` instead.
+    def __init__(self, file_path=None, encoding="utf-8"):
+        self.file_path = file_path
+        self.encoding = encoding
+        self.document = None
+        self.highlighter = None
+        self.stats = None
+        self.journal = None
+        self.large_file_view = None
+        self.recovered = False
+        # (mtime, size) of the version we last read or wrote, and the path watched for it
+        self.disk_state = None
+        self.watched_path = None
+        # caret (position, anchor) and scroll bar values while the tab is in the background
+        self.cursor = (0, 0)
+        self.scroll = (0, 0)
+        self.last_used = 0
+
+    @property
+    def title(self):
+        return os.path.basename(self.file_path) if self.file_path else "Untitled"
+
+    @property
+    def loaded(self):
+        return self.document is not None or self.large_file_view is not None
+
+    def is_modified(self):
+        return self.document is not None and self.document.isModified()
+
+    def is_blank(self):
+        # a fresh Untitled tab, opening a file may reuse it
+        return self.file_path is None and not self.recovered and \
+            (self.document is None or (self.document.isEmpty() and not self.document.isModified()))
+
+    def size(self):
+        # characters held in memory, a mapped large file costs next to nothing
+        return self.document.characterCount() if self.document is not None else 0
+
+
+class DocumentManager(QObject):
+    # The open tabs in tab bar order. Loaded tabs beyond `max_loaded`, or
+    # beyond `memory_budget` characters in total, are evicted least recently
+    # used first; only unmodified tabs backed by a file are ever evicted.
+    def __init__(self, parent=None, memory_budget=32 * 1024 * 1024, max_loaded=16):
+        super().__init__(parent)
+        self.documents = []
+        self.current = None
+        self.memory_budget = memory_budget
+        self.max_loaded = max_loaded
+        self._clock = itertools.count(1)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def __getitem__(self, index):
+        return self.documents[index]
+
+    def index(self, doc):
+        return self.documents.index(doc)
+
+    def add(self, doc, index=None):
+        if index is None:
+            index = len(self.documents)
+        self.documents.insert(index, doc)
+        return index
+
+    def remove(self, doc):
+        self.documents.remove(doc)
+        if doc is self.current:
+            self.current = None
+
+    def move(self, from_index, to_index):
+        self.documents.insert(to_index, self.documents.pop(from_index))
+
+    def find(self, file_path):
+        if not file_path:
+            return None
+        target = _same_path(file_path)
+        for doc in self.documents:
+            if doc.file_path and _same_path(doc.file_path) == target:
+                return doc
+        return None
+
+    def touch(self, doc):
+        self.current = doc
+        doc.last_used = next(self._clock)
+
+    def eviction_candidates(self, can_evict):
+        loaded = [doc for doc in self.documents if doc.loaded]
+        count = len(loaded)
+        total = sum(doc.size() for doc in loaded)
+        victims = []
+        for doc in sorted(loaded, key=lambda d: d.last_used):
+            if count <= self.max_loaded and total <= self.memory_budget:
+                break
+            if doc is self.current or not doc.file_path or doc.is_modified() or not can_evict(doc):
+                continue
+            victims.append(doc)
+            count -= 1
+            total -= doc.size()
+        return victims
+
+
+def session_path():
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation) or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "PyPad")
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, "session.json")
+
+
+def save_session(file_paths, current):
+    try:
+        with open(session_path(), "w", encoding="utf-8") as f:
+            json.dump({"files": file_paths, "current": current}, f)
+    except OSError:
+        pass
+
+
+def load_session():
+    # (paths of the tabs open at the last exit that still exist, index of the active one)
+    try:
+        with open(session_path(), "r", encoding="utf-8") as f:
+            session = json.load(f)
+        files = session["files"]
+        current = files[session["current"]] if 0 <= session["current"] < len(files) else None
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        return [], 0
+    files = [path for path in files if isinstance(path, str) and os.path.isfile(path)]
+    return files, files.index(current) if current in files else 0
@@ -0,0 +1,190 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+import codecs
+import os
+
+CHUNK_SIZE = 128 * 1024
+
+# these codecs consume the BOM when decoding and write it back when saving
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le-bom"),
+    (codecs.BOM_UTF32_BE, "utf-32-be-bom"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16-le-bom"),
+    (codecs.BOM_UTF16_BE, "utf-16-be-bom"),
+)
+
+# bytes that do not decode are kept as lone surrogates and written back as
+# they were, instead of becoming U+FFFD in the buffer and then in the file
+DECODE_ERRORS = "surrogateescape"
+
+
+def _bom_codec(name):
+    # "utf-16-be-bom" and friends: like "utf-16", but saved in the byte order
+    # of the BOM the file was read with, not the machine's
+    for bom, encoding in BOMS:
+        if encoding.replace("-", "_") == name and encoding.endswith("-bom"):
+            break
+    else:
+        return None
+    base = encoding[:-4].replace("-", "_")
+    base_encode = getattr(codecs, base + "_encode")
+    base_decode = getattr(codecs, base + "_decode")
+
+    def encode_all(text, errors="strict"):
+        data, consumed = base_encode(text, errors)
+        return bom + data, consumed
+
+    def decode_all(data, errors="strict"):
+        skip = len(bom) if bytes(data[:len(bom)]) == bom else 0
+        text, consumed = base_decode(bytes(data[skip:]), errors, True)
+        return text, consumed + skip
+
+    class IncrementalEncoder(codecs.IncrementalEncoder):
+        def __init__(self, errors="strict"):
+            super().__init__(errors)
+            self.first = True
+
+        def encode(self, text, final=False):
+            data = base_encode(text, self.errors)[0]
+            if self.first:
+                self.first = False
+                data = bom + data
+            return data
+
+        def reset(self):
+            self.first = True
+
+        def getstate(self):
+            return 2 if self.first else 0
+
+        def setstate(self, state):
+            self.first = bool(state)
+
+    class IncrementalDecoder(codecs.BufferedIncrementalDecoder):
+        def __init__(self, errors="strict"):
+            super().__init__(errors)
+            self.first = True
+
+        def _buffer_decode(self, data, errors, final):
+            skip = 0
+            if self.first:
+                if len(data) < len(bom) and bom.startswith(data) and not final:
+                    return "", 0
+                self.first = False
+                if data.startswith(bom):
+                    skip = len(bom)
+            text, consumed = base_decode(data[skip:], errors, final)
+            return text, consumed + skip
+
+        def reset(self):
+            super().reset()
+            self.first = True
+
+    class StreamWriter(codecs.StreamWriter):
+        encode = staticmethod(encode_all)
+
+    class StreamReader(codecs.StreamReader):
+        decode = staticmethod(decode_all)
+
+    return codecs.CodecInfo(encode_all, decode_all, StreamReader, StreamWriter,
+                            IncrementalEncoder, IncrementalDecoder, name=encoding)
+
+
+codecs.register(_bom_codec)
+
+
+def detect_encoding(head, final=True):
+    # guess the codec of a file from its first bytes, final=False when more
+    # data follows so a multi-byte character cut at the end is not an error
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+
+    # BOM-less UTF-16: ASCII text leaves every other byte zero
+    sample = head[:4096]
+    if len(sample) >= 2:
+        even_zeros = sample[0::2].count(0)
+        odd_zeros = sample[1::2].count(0)
+        half = len(sample) // 2
+        if odd_zeros > half * 0.4 and even_zeros < half * 0.05:
+            return "utf-16-le"
+        if even_zeros > half * 0.4 and odd_zeros < half * 0.05:
+            return "utf-16-be"
+
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=final)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    return "cp1252"
+
+
+class NewlineNormalizer:
+    # \r\n and \r -> \n across chunk boundaries, like open(..., "r") does
+    def __init__(self):
+        self._pending_cr = False
+
+    def feed(self, text, final=False):
+        if self._pending_cr:
+            text = "\r" + text
+            self._pending_cr = False
+        if text.endswith("\r") and not final:
+            text = text[:-1]
+            self._pending_cr = True
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def read_text_file(file_path):
+    # synchronous read for small files, returns (text, encoding)
+    with open(file_path, "rb") as f:
+        data = f.read()
+    # a multibyte character may straddle the end of the probe unless it is the whole file
+    encoding = detect_encoding(data[:CHUNK_SIZE], final=len(data) <= CHUNK_SIZE)
+    text = data.decode(encoding, errors=DECODE_ERRORS)
+    return NewlineNormalizer().feed(text, final=True), encoding
+
+
+class FileLoadThread(QThread):
+    encoding_detected = pyqtSignal(int, str)
+    chunk_loaded = pyqtSignal(int, str, int)
+    load_finished = pyqtSignal(int)
+    load_failed = pyqtSignal(int, str)
+
+    def __init__(self, job_id, file_path, chunk_size=CHUNK_SIZE):
+        super().__init__()
+        self.job_id = job_id
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.total_bytes = os.path.getsize(file_path)
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            with open(self.file_path, "rb") as f:
+                head = f.read(self.chunk_size)
+                encoding = detect_encoding(head, final=len(head) < self.chunk_size)
+                self.encoding_detected.emit(self.job_id, encoding)
+
+                decoder = codecs.getincrementaldecoder(encoding)(errors=DECODE_ERRORS)
+                newlines = NewlineNormalizer()
+                chunk = head
+                bytes_read = len(head)
+                while chunk:
+                    if self._cancelled:
+                        return
+                    text = newlines.feed(decoder.decode(chunk))
+                    if text:
+                        self.chunk_loaded.emit(self.job_id, text, bytes_read)
+                    chunk = f.read(self.chunk_size)
+                    bytes_read += len(chunk)
+
+                tail = newlines.feed(decoder.decode(b"", final=True), final=True)
+                if tail:
+                    self.chunk_loaded.emit(self.job_id, tail, bytes_read)
+            self.load_finished.emit(self.job_id)
+        except Exception as e:
+            self.load_failed.emit(self.job_id, str(e))
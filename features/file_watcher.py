@@ -0,0 +1,122 @@
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+import os
+
+
+def file_snapshot(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class FileWatcher(QObject):
+    # QFileSystemWatcher with the events coalesced: every path that changed
+    # during a burst is reported once, `debounce_ms` after the burst calms
+    # down or at most `max_delay_ms` after it started. Paths the OS refuses
+    # to watch (inotify limits, network mounts) are polled by mtime/size.
+    directories_changed = pyqtSignal(list)
+    files_changed = pyqtSignal(list)
+
+    def __init__(self, parent=None, debounce_ms=300, max_delay_ms=2000, poll_ms=2000):
+        super().__init__(parent)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._files = set()
+        self._directories = set()
+        self._polled = {}
+        self._pending_dirs = set()
+        self._pending_files = set()
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(debounce_ms)
+        self._debounce.timeout.connect(self.flush)
+
+        self._deadline = QTimer(self)
+        self._deadline.setSingleShot(True)
+        self._deadline.setInterval(max_delay_ms)
+        self._deadline.timeout.connect(self.flush)
+
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(poll_ms)
+        self._poll_timer.timeout.connect(self._poll)
+
+    def watch_directory(self, path):
+        if path not in self._directories:
+            self._directories.add(path)
+            self._add(path)
+
+    def unwatch_directory(self, path):
+        if path in self._directories:
+            self._directories.discard(path)
+            self._remove(path)
+
+    def watch_file(self, path):
+        if path not in self._files:
+            self._files.add(path)
+            self._add(path)
+
+    def unwatch_file(self, path):
+        if path in self._files:
+            self._files.discard(path)
+            self._remove(path)
+
+    def clear(self):
+        for path in list(self._directories):
+            self.unwatch_directory(path)
+        for path in list(self._files):
+            self.unwatch_file(path)
+        self._pending_dirs.clear()
+        self._pending_files.clear()
+
+    def _add(self, path):
+        if not self._watcher.addPath(path):
+            self._polled[path] = file_snapshot(path)
+            if not self._poll_timer.isActive():
+                self._poll_timer.start()
+
+    def _remove(self, path):
+        if self._polled.pop(path, 0) == 0:
+            self._watcher.removePath(path)
+        if not self._polled:
+            self._poll_timer.stop()
+
+    def _poll(self):
+        for path, old in list(self._polled.items()):
+            new = file_snapshot(path)
+            if new != old:
+                self._polled[path] = new
+                self._queue(path)
+
+    def _on_directory_changed(self, path):
+        self._queue(path)
+
+    def _on_file_changed(self, path):
+        # editors (and our own atomic_write) replace the file, which drops
+        # the inotify watch on it; watch the new file again
+        if path in self._files and path not in self._watcher.files():
+            if not os.path.exists(path) or not self._watcher.addPath(path):
+                self._polled[path] = file_snapshot(path)
+                self._poll_timer.start()
+        self._queue(path)
+
+    def _queue(self, path):
+        if path in self._directories:
+            self._pending_dirs.add(path)
+        if path in self._files:
+            self._pending_files.add(path)
+        self._debounce.start()
+        if not self._deadline.isActive():
+            self._deadline.start()
+
+    def flush(self):
+        self._debounce.stop()
+        self._deadline.stop()
+        dirs, self._pending_dirs = self._pending_dirs, set()
+        files, self._pending_files = self._pending_files, set()
+        if dirs:
+            self.directories_changed.emit(sorted(dirs))
+        if files:
+            self.files_changed.emit(sorted(files))
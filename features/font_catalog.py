@@ -0,0 +1,72 @@
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from PyQt5.QtGui import QFontDatabase
+
+
+class FontEntry:
+    __slots__ = ("family", "styles", "monospace", "key")
+
+    def __init__(self, family, styles, monospace):
+        self.family = family
+        self.styles = styles
+        self.monospace = monospace
+        # lower-cased once, for sorting and filtering
+        self.key = family.lower()
+
+
+def build_catalog():
+    # QFontDatabase is thread-safe; asking every family for its styles and
+    # pitch is what makes this slow with thousands of fonts installed
+    db = QFontDatabase()
+    entries = [FontEntry(family, tuple(db.styles(family)), db.isFixedPitch(family))
+               for family in db.families() if not db.isPrivateFamily(family)]
+    entries.sort(key=lambda e: e.key)
+    return entries
+
+
+class FontCatalogThread(QThread):
+    catalog_ready = pyqtSignal(list)
+
+    def run(self):
+        self.catalog_ready.emit(build_catalog())
+
+
+class FontCatalog(QObject):
+    # Installed font families with their styles and whether they are
+    # monospace, read once per process. load() starts reading on a worker
+    # thread, `ready` is emitted once `entries` is set.
+    ready = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries = None
+        self._thread = None
+
+    @property
+    def loaded(self):
+        return self.entries is not None
+
+    def load(self):
+        if self.entries is not None or self._thread is not None:
+            return
+        thread = FontCatalogThread()
+        thread.catalog_ready.connect(self._on_catalog_ready)
+        thread.finished.connect(self._on_thread_finished)
+        self._thread = thread
+        thread.start()
+
+    def _on_catalog_ready(self, entries):
+        self.entries = entries
+        self.ready.emit()
+
+    def _on_thread_finished(self):
+        self._thread = None
+
+
+_catalog = None
+
+
+def font_catalog():
+    global _catalog
+    if _catalog is None:
+        _catalog = FontCatalog()
+    return _catalog
@@ -0,0 +1,324 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import codecs
+import functools
+import hashlib
+import mmap
+import os
+import re
+import threading
+import time
+
+READ_SIZE = 1024 * 1024
+# files at least this big are hashed straight from an mmap
+MMAP_THRESHOLD = 16 * 1024 * 1024
+MMAP_CHUNK = 8 * 1024 * 1024
+TEXT_CHUNK_CHARS = 1024 * 1024
+
+# hex digest length -> algorithm, for manifest lines without an algorithm tag
+DIGEST_SIZES = {32: "md5", 40: "sha1", 56: "sha224", 64: "sha256", 96: "sha384", 128: "sha512"}
+
+_GNU_LINE = re.compile(r"\\?([0-9a-fA-F]+) [ *](.*)")
+_BSD_LINE = re.compile(r"\\?([A-Za-z0-9-]+) ?\((.*)\) ?= ?([0-9a-fA-F]+)")
+
+
+class HashCancelled(Exception):
+    pass
+
+
+_buffers = threading.local()
+
+
+def _read_buffer():
+    # one reusable buffer per worker thread, filled with readinto()
+    buf = getattr(_buffers, "buf", None)
+    if buf is None:
+        buf = _buffers.buf = bytearray(READ_SIZE)
+    return buf
+
+
+def _map_file(f):
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+def _hash_mapped(mm, hashers, progress, is_cancelled):
+    # hashlib reads the mapped pages directly; pages already hashed are
+    # dropped from the mapping so resident memory stays flat
+    advise = getattr(mm, "madvise", None)
+    if advise is not None:
+        advise(mmap.MADV_SEQUENTIAL)
+    size = len(mm)
+    with memoryview(mm) as view:
+        for start in range(0, size, MMAP_CHUNK):
+            if is_cancelled is not None and is_cancelled():
+                raise HashCancelled()
+            with view[start:start + MMAP_CHUNK] as chunk:
+                for h in hashers.values():
+                    h.update(chunk)
+                n = len(chunk)
+            if advise is not None:
+                advise(mmap.MADV_DONTNEED, start, n)
+            if progress is not None:
+                progress(n)
+
+
+def hash_file(path, factories, progress=None, is_cancelled=None):
+    # {name: hexdigest} for `factories` {name: hashlib constructor}; every
+    # chunk is read once and fed to all hashers. hashlib releases the GIL on
+    # large updates, so several files hash in parallel
+    hashers = {name: factory() for name, factory in factories.items()}
+    with open(path, "rb", buffering=0) as f:
+        mm = _map_file(f) if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD else None
+        if mm is not None:
+            with mm:
+                _hash_mapped(mm, hashers, progress, is_cancelled)
+            return {name: h.hexdigest() for name, h in hashers.items()}
+
+        buf = _read_buffer()
+        view = memoryview(buf)
+        while True:
+            if is_cancelled is not None and is_cancelled():
+                raise HashCancelled()
+            n = f.readinto(buf)
+            if not n:
+                break
+            chunk = view[:n]
+            for h in hashers.values():
+                h.update(chunk)
+            if progress is not None:
+                progress(n)
+    return {name: h.hexdigest() for name, h in hashers.items()}
+
+
+def hash_text(text, factories, encoding="utf-8", progress=None, is_cancelled=None):
+    # like hash_file for a str: encoded TEXT_CHUNK_CHARS characters at a
+    # time, so the encoded copy of the whole text never exists; progress is
+    # in characters
+    hashers = {name: factory() for name, factory in factories.items()}
+    # one encoder for all chunks, so a BOM is written once, as on save
+    encoder = codecs.getincrementalencoder(encoding)("surrogateescape")
+    for start in range(0, len(text), TEXT_CHUNK_CHARS):
+        if is_cancelled is not None and is_cancelled():
+            raise HashCancelled()
+        data = encoder.encode(text[start:start + TEXT_CHUNK_CHARS])
+        for h in hashers.values():
+            h.update(data)
+        if progress is not None:
+            progress(min(TEXT_CHUNK_CHARS, len(text) - start))
+    # an empty text still gets its BOM
+    data = encoder.encode("", final=True)
+    for h in hashers.values():
+        h.update(data)
+    return {name: h.hexdigest() for name, h in hashers.items()}
+
+
+def algorithm_factory(name):
+    return functools.partial(hashlib.new, name)
+
+
+def parse_manifest(text):
+    # sha256sum/md5sum lines ("<hex>  name", "<hex> *name") and BSD/--tag
+    # lines ("SHA256 (name) = <hex>") -> ([(algorithm, hex, name)], number of
+    # lines that could not be parsed)
+    entries = []
+    bad = 0
+    for line in text.splitlines():
+        line = line.rstrip("\r")
+        if not line.strip() or line.startswith("#"):
+            continue
+        m = _GNU_LINE.fullmatch(line)
+        if m and len(m.group(1)) in DIGEST_SIZES:
+            algo = DIGEST_SIZES[len(m.group(1))]
+            digest, name = m.group(1), m.group(2)
+        else:
+            m = _BSD_LINE.fullmatch(line)
+            if m is None:
+                bad += 1
+                continue
+            algo = m.group(1).lower().replace("-", "")
+            name, digest = m.group(2), m.group(3)
+        if algo not in hashlib.algorithms_available:
+            bad += 1
+            continue
+        if line.startswith("\\"):
+            # coreutils escapes names containing a backslash or a newline
+            name = name.replace("\\\\", "\0").replace("\\n", "\n").replace("\0", "\\")
+        entries.append((algo, digest.lower(), name))
+    return entries, bad
+
+
+class HashJob(QThread):
+    # Hashes `paths` on a small thread pool. Each file's digests are emitted
+    # as soon as it is done, progress (bytes done, bytes total, bytes/s) at
+    # most every 100 ms. `path_factories` overrides `factories` per path, so
+    # a manifest can check each file with only the algorithms it lists.
+    file_hashed = pyqtSignal(int, str, dict)
+    file_failed = pyqtSignal(int, str, str)
+    progress = pyqtSignal(int, "qint64", "qint64", float)
+    job_finished = pyqtSignal(int, bool)
+
+    def __init__(self, job_id, paths, factories, workers=None, path_factories=None):
+        super().__init__()
+        self.job_id = job_id
+        self.paths = list(paths)
+        self.factories = dict(factories)
+        self.path_factories = path_factories or {}
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self._done_bytes = 0
+
+    def cancel(self):
+        self._cancelled = True
+
+    def _is_cancelled(self):
+        return self._cancelled
+
+    def _add_progress(self, n):
+        with self._lock:
+            self._done_bytes += n
+
+    def _hash_one(self, path):
+        factories = self.path_factories.get(path, self.factories)
+        return hash_file(path, factories, self._add_progress, self._is_cancelled)
+
+    def run(self):
+        total = 0
+        for path in self.paths:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(self.workers) as pool:
+            futures = {pool.submit(self._hash_one, path): path for path in self.paths}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.cancelled():
+                        continue
+                    path = futures[future]
+                    try:
+                        digests = future.result()
+                    except HashCancelled:
+                        continue
+                    except OSError as e:
+                        self.file_failed.emit(self.job_id, path, e.strerror or str(e))
+                        continue
+                    except Exception as e:
+                        # nothing may escape run(), PyQt aborts on it
+                        self.file_failed.emit(self.job_id, path, str(e))
+                        continue
+                    self.file_hashed.emit(self.job_id, path, digests)
+                elapsed = max(time.monotonic() - start, 1e-6)
+                self.progress.emit(self.job_id, self._done_bytes, total, self._done_bytes / elapsed)
+                if self._cancelled:
+                    for future in pending:
+                        future.cancel()
+        self.job_finished.emit(self.job_id, self._cancelled)
+
+
+class BufferHashJob(QThread):
+    # HashJob for the text of an open document, with the same signals;
+    # progress is counted in characters
+    file_hashed = pyqtSignal(int, str, dict)
+    file_failed = pyqtSignal(int, str, str)
+    progress = pyqtSignal(int, "qint64", "qint64", float)
+    job_finished = pyqtSignal(int, bool)
+
+    def __init__(self, job_id, name, text, factories, encoding="utf-8"):
+        super().__init__()
+        self.job_id = job_id
+        self.name = name
+        self.text = text
+        self.factories = dict(factories)
+        self.encoding = encoding
+        self._cancelled = False
+        self._done = 0
+
+    def cancel(self):
+        self._cancelled = True
+
+    def _add_progress(self, n):
+        self._done += n
+        elapsed = max(time.monotonic() - self._start, 1e-6)
+        self.progress.emit(self.job_id, self._done, len(self.text), self._done / elapsed)
+
+    def run(self):
+        self._start = time.monotonic()
+        try:
+            digests = hash_text(self.text, self.factories, self.encoding, self._add_progress, lambda: self._cancelled)
+        except HashCancelled:
+            pass
+        except UnicodeEncodeError as e:
+            self.file_failed.emit(self.job_id, self.name, str(e))
+        else:
+            self.file_hashed.emit(self.job_id, self.name, digests)
+        self.job_finished.emit(self.job_id, self._cancelled)
+
+
+class TextHashThread(QThread):
+    # Live digests for the text typed into HashDialog. In per-line mode every
+    # digest is first looked up in `cache` {(algorithm, line): hex}, so an
+    # edit only re-hashes the lines it touched; the digests of the current
+    # lines are emitted and become the next cache. The output lines come with
+    # how many leading and trailing lines match `previous`, so the dialog only
+    # replaces the lines in between.
+    hashed = pyqtSignal(int, list, int, int, dict)
+
+    def __init__(self, job_id, text, algorithms, per_line, cache, previous):
+        super().__init__()
+        self.job_id = job_id
+        self.text = text
+        self.algorithms = dict(algorithms)
+        self.per_line = per_line
+        self.cache = cache
+        self.previous = previous
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        labelled = len(self.algorithms) > 1
+        if not self.per_line:
+            try:
+                digests = hash_text(self.text, self.algorithms, is_cancelled=lambda: self._cancelled)
+            except HashCancelled:
+                return
+            results = [f"{label}: {digest}" if labelled else digest for label, digest in digests.items()]
+            self.hashed.emit(self.job_id, results, 0, 0, {})
+            return
+
+        chunks = [line for line in self.text.splitlines() if line.strip()]
+        cache = self.cache
+        used = {}
+        results = []
+        for i, chunk in enumerate(chunks):
+            if i % 1000 == 0 and self._cancelled:
+                return
+            data = None
+            for label, algo in self.algorithms.items():
+                key = (label, chunk)
+                digest = cache.get(key) or used.get(key)
+                if digest is None:
+                    if data is None:
+                        data = chunk.encode()
+                    digest = algo(data).hexdigest()
+                used[key] = digest
+                results.append(f"{label}: {digest}" if labelled else digest)
+
+        previous = self.previous
+        limit = min(len(previous), len(results))
+        head = 0
+        while head < limit and previous[head] == results[head]:
+            head += 1
+        tail = 0
+        while tail < limit - head and previous[-1 - tail] == results[-1 - tail]:
+            tail += 1
+        self.hashed.emit(self.job_id, results, head, tail, used)
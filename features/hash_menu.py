@@ -1,11 +1,29 @@
 import hashlib
 import os
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QTextCursor
 from PyQt5.QtWidgets import (
 	QAction, QMenu, QFileDialog, QMessageBox,
-	QDialog, QVBoxLayout, QCheckBox, QTextEdit,
-	QPushButton, QHBoxLayout, QApplication
+	QDialog, QVBoxLayout, QCheckBox, QPlainTextEdit,
+	QPushButton, QHBoxLayout, QApplication, QProgressBar, QLabel
 )
 
+from features.hash_engine import HashJob, BufferHashJob, TextHashThread, parse_manifest, algorithm_factory
+
+HASH_ALGORITHMS = {
+	"MD5": hashlib.md5,
+	"SHA-1": hashlib.sha1,
+	"SHA-256": hashlib.sha256,
+	"SHA-512": hashlib.sha512,
+}
+
+
+def format_bytes(n):
+	for unit in ("B", "KB", "MB", "GB"):
+		if n < 1024 or unit == "GB":
+			return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+		n /= 1024
+
 
 class HashDialog(QDialog):
 	def __init__(self, algo_func, parent=None, preset_text=None, preset_results=None):
@@ -20,27 +38,76 @@ class HashDialog(QDialog):
 		self.checkbox = QCheckBox("Treat each line as a separate string")
 		layout.addWidget(self.checkbox)
 
-		self.input_edit = QTextEdit()
+		# every checked algorithm is computed from the same read of the input
+		algo_layout = QHBoxLayout()
+		self.algo_checks = {}
+		for label, func in HASH_ALGORITHMS.items():
+			check = QCheckBox(label)
+			check.setChecked(func().name == algo_func().name)
+			check.stateChanged.connect(self.schedule_update)
+			algo_layout.addWidget(check)
+			self.algo_checks[label] = check
+		algo_layout.addStretch(1)
+		layout.addLayout(algo_layout)
+
+		self.input_edit = QPlainTextEdit()
 		layout.addWidget(self.input_edit)
 
-		self.output_edit = QTextEdit()
+		self.output_edit = QPlainTextEdit()
 		self.output_edit.setReadOnly(True)
+		self.output_edit.setUndoRedoEnabled(False)
 		layout.addWidget(self.output_edit)
 
+		# file hashing progress, only shown while a job runs
+		job_layout = QHBoxLayout()
+		self.job_progress = QProgressBar()
+		self.job_progress.setRange(0, 1000)
+		self.job_progress.setTextVisible(False)
+		self.job_label = QLabel("")
+		self.job_cancel_btn = QPushButton("Cancel")
+		job_layout.addWidget(self.job_progress, 1)
+		job_layout.addWidget(self.job_label)
+		job_layout.addWidget(self.job_cancel_btn)
+		layout.addLayout(job_layout)
+		self.job_progress.hide()
+		self.job_cancel_btn.hide()
+		self._job = None
+		self._job_id = 0
+		self._expected = {}
+		self._verify_counts = None
+
+		# live digests of the input: hashed on a worker once typing pauses
+		self._live_id = 0
+		self._live_threads = []
+		self._line_cache = {}
+		self._output_lines = []
+		self._update_timer = QTimer(self)
+		self._update_timer.setSingleShot(True)
+		self._update_timer.setInterval(150)
+		self._update_timer.timeout.connect(self.update_hash)
+
 		btn_layout = QHBoxLayout()
+		self.files_btn = QPushButton("Hash Files...")
+		self.verify_btn = QPushButton("Verify Checksums...")
 		self.copy_btn = QPushButton("Copy to Clipboard")
 		self.close_btn = QPushButton("Close")
+		btn_layout.addWidget(self.files_btn)
+		btn_layout.addWidget(self.verify_btn)
 		btn_layout.addWidget(self.copy_btn)
 		btn_layout.addWidget(self.close_btn)
 		layout.addLayout(btn_layout)
 
-		self.input_edit.textChanged.connect(self.update_hash)
-		self.checkbox.stateChanged.connect(self.update_hash)
+		self.input_edit.textChanged.connect(self.schedule_update)
+		self.checkbox.stateChanged.connect(self.schedule_update)
+		self.files_btn.clicked.connect(self.choose_files)
+		self.verify_btn.clicked.connect(self.choose_manifest)
 		self.copy_btn.clicked.connect(self.copy_to_clipboard)
 		self.close_btn.clicked.connect(self.close)
+		self.job_cancel_btn.clicked.connect(self.cancel_job)
 
 		if preset_text:
 			self.input_edit.setPlainText(preset_text)
+			self.update_hash()
 		if preset_results:
 			self.output_edit.setPlainText("\n".join(preset_results))
 
@@ -49,22 +116,196 @@ class HashDialog(QDialog):
 		else:
 			self.apply_light_theme()
 
+	def schedule_update(self):
+		self._update_timer.start()
+
 	def update_hash(self):
+		self._update_timer.stop()
+		self._live_id += 1
+		for thread in self._live_threads:
+			thread.cancel()
+
 		text = self.input_edit.toPlainText()
 		if not text.strip():
+			self._output_lines = []
 			self.output_edit.clear()
 			return
 
-		algo = self.algo_func
-		results = []
-		if self.checkbox.isChecked():
-			for line in text.splitlines():
-				if line.strip():
-					results.append(algo(line.encode()).hexdigest())
+		thread = TextHashThread(
+			self._live_id, text, self.selected_algorithms(), self.checkbox.isChecked(),
+			self._line_cache, self._output_lines
+		)
+		thread.hashed.connect(self._on_text_hashed)
+		thread.finished.connect(lambda: self._live_threads.remove(thread))
+		self._live_threads.append(thread)
+		thread.start()
+
+	def _on_text_hashed(self, job_id, lines, head, tail, cache):
+		if job_id != self._live_id:
+			return
+		self._line_cache = cache
+		old, self._output_lines = self._output_lines, lines
+		doc = self.output_edit.document()
+		if not old or head + tail == 0 or doc.blockCount() != len(old):
+			self.output_edit.setPlainText("\n".join(lines))
+			return
+
+		# swap only the lines that changed, as one edit
+		changed = lines[head:len(lines) - tail]
+		if tail:
+			start = doc.findBlockByNumber(head).position()
+			end = doc.findBlockByNumber(len(old) - tail).position()
+			text = "".join(line + "\n" for line in changed)
 		else:
-			results.append(algo(text.encode()).hexdigest())
+			block = doc.findBlockByNumber(head - 1)
+			start = block.position() + block.length() - 1
+			end = doc.characterCount() - 1
+			text = "".join("\n" + line for line in changed)
+		cursor = QTextCursor(doc)
+		cursor.setPosition(start)
+		cursor.setPosition(end, QTextCursor.KeepAnchor)
+		cursor.insertText(text)
+
+	def selected_algorithms(self):
+		return {label: HASH_ALGORITHMS[label] for label, check in self.algo_checks.items() if check.isChecked()}
+
+	def choose_files(self):
+		paths, _ = QFileDialog.getOpenFileNames(self, "Select Files")
+		if paths:
+			self.output_edit.clear()
+			self.hash_files([path for path in paths if os.path.isfile(path)])
+
+	def choose_manifest(self):
+		path, _ = QFileDialog.getOpenFileName(
+			self, "Select Checksum File", "", "Checksum files (*.sha256 *.sha1 *.sha512 *.md5 *SUMS *sums *.txt);;All files (*)"
+		)
+		if path:
+			self.verify_manifest(path)
+
+	def hash_files(self, paths):
+		# digests stream in as each file finishes, files hash in parallel
+		algorithms = self.selected_algorithms()
+		if not algorithms:
+			self.job_label.setText("Select at least one algorithm")
+			return
+		self._verify_counts = None
+		self._start_job(HashJob(self._job_id + 1, paths, algorithms), f"Hashing {len(paths)} files...")
+
+	def hash_buffer(self, name, text):
+		# the text is encoded a chunk at a time on the worker
+		algorithms = self.selected_algorithms()
+		if not algorithms:
+			self.job_label.setText("Select at least one algorithm")
+			return
+		self._verify_counts = None
+		self._start_job(BufferHashJob(self._job_id + 1, name, text, algorithms), f"Hashing {name}...")
+
+	def verify_manifest(self, manifest_path):
+		# names in the manifest are relative to the manifest's folder; each
+		# file is read once for all the algorithms listed for it
+		try:
+			with open(manifest_path, "r", encoding="utf-8", errors="replace") as f:
+				entries, bad = parse_manifest(f.read())
+		except OSError as e:
+			QMessageBox.critical(self, "Error", f"Could not read {manifest_path}:\n{e}")
+			return
 
-		self.output_edit.setPlainText("\n".join(results))
+		base = os.path.dirname(manifest_path)
+		self._expected = {}
+		path_factories = {}
+		for algo, digest, name in entries:
+			path = os.path.normpath(os.path.join(base, name))
+			self._expected.setdefault(path, []).append((algo, digest, name))
+			path_factories.setdefault(path, {})[algo] = algorithm_factory(algo)
+
+		self.output_edit.clear()
+		if bad:
+			self.output_edit.appendPlainText(f"{os.path.basename(manifest_path)}: {bad} improperly formatted lines")
+		self._verify_counts = {"OK": 0, "FAILED": 0, "MISSING": 0}
+		paths = list(self._expected)
+		job = HashJob(self._job_id + 1, paths, {}, path_factories=path_factories)
+		self._start_job(job, f"Verifying {len(paths)} files...")
+
+	def _start_job(self, job, message):
+		self.cancel_job()
+		self._output_lines = []
+		self._job_id = job.job_id
+		job.file_hashed.connect(self._on_file_hashed)
+		job.file_failed.connect(self._on_file_failed)
+		job.progress.connect(self._on_job_progress)
+		job.job_finished.connect(self._on_job_finished)
+		self._job = job
+		self.job_progress.setValue(0)
+		self.job_progress.show()
+		self.job_cancel_btn.show()
+		self.job_label.setText(message)
+		job.start()
+
+	def cancel_job(self):
+		if self._job is not None:
+			self._job.cancel()
+			self._job.wait()
+			self._job = None
+
+	def _on_file_hashed(self, job_id, path, digests):
+		if job_id != self._job_id:
+			return
+		if self._verify_counts is not None:
+			for algo, digest, name in self._expected.get(path, ()):
+				status = "OK" if digests.get(algo) == digest else "FAILED"
+				self._verify_counts[status] += 1
+				self.output_edit.appendPlainText(f"{name}: {status}")
+		elif len(digests) == 1:
+			for digest in digests.values():
+				self.output_edit.appendPlainText(f"{os.path.basename(path)}: {digest}")
+		else:
+			# BSD style, which Verify Checksums reads back
+			for label, digest in digests.items():
+				self.output_edit.appendPlainText(f"{label} ({os.path.basename(path)}) = {digest}")
+
+	def _on_file_failed(self, job_id, path, message):
+		if job_id != self._job_id:
+			return
+		if self._verify_counts is not None:
+			status = "FAILED" if os.path.exists(path) else "MISSING"
+			for _, _, name in self._expected.get(path, ()):
+				self._verify_counts[status] += 1
+				self.output_edit.appendPlainText(f"{name}: {status} ({message})")
+		else:
+			self.output_edit.appendPlainText(f"{os.path.basename(path)}: error: {message}")
+
+	def _on_job_progress(self, job_id, done, total, rate):
+		if job_id != self._job_id:
+			return
+		self.job_progress.setValue(int(1000 * done / total) if total else 1000)
+		eta = f", {int((total - done) / rate)} s left" if rate > 0 and done < total else ""
+		self.job_label.setText(f"{format_bytes(done)} of {format_bytes(total)}, {format_bytes(rate)}/s{eta}")
+
+	def _on_job_finished(self, job_id, cancelled):
+		if job_id != self._job_id:
+			return
+		self._job = None
+		self.job_progress.hide()
+		self.job_cancel_btn.hide()
+		if cancelled:
+			self.job_label.setText("Cancelled")
+		elif self._verify_counts is not None:
+			self.job_label.setText(", ".join(f"{n} {status}" for status, n in self._verify_counts.items()))
+
+	def _stop_workers(self):
+		self.cancel_job()
+		self._update_timer.stop()
+		for thread in list(self._live_threads):
+			thread.cancel()
+			thread.wait()
+
+	def done(self, result):
+		self._stop_workers()
+		super().done(result)
+
+	def closeEvent(self, event):
+		self._stop_workers()
+		super().closeEvent(event)
 
 	def copy_to_clipboard(self):
 		QApplication.clipboard().setText(self.output_edit.toPlainText())
@@ -72,7 +313,7 @@ class HashDialog(QDialog):
 	def apply_dark_theme(self):
 		self.setStyleSheet("""
 			QDialog { background-color: #2d2d2d; color: white; }
-			QTextEdit {
+			QPlainTextEdit {
 				background-color: #1e1e1e;
 				color: #d4d4d4;
 				border: 1px solid #444444;
@@ -94,7 +335,7 @@ class HashDialog(QDialog):
 	def apply_light_theme(self):
 		self.setStyleSheet("""
 			QDialog { background-color: white; color: black; }
-			QTextEdit {
+			QPlainTextEdit {
 				background-color: #ffffff;
 				color: black;
 				border: 1px solid #cccccc;
@@ -115,18 +356,11 @@ class HashDialog(QDialog):
 
 
 
-def create_hash_menu(parent):
-	menu_bar = parent.menuBar()
-	tools_menu = menu_bar.addMenu("Tools")
-
-	hash_algorithms = {
-		"MD5": hashlib.md5,
-		"SHA-1": hashlib.sha1,
-		"SHA-256": hashlib.sha256,
-		"SHA-512": hashlib.sha512,
-	}
+def create_hash_menu(parent, tools_menu=None):
+	if tools_menu is None:
+		tools_menu = parent.menuBar().addMenu("Tools")
 
-	for algo_name, algo_func in hash_algorithms.items():
+	for algo_name, algo_func in HASH_ALGORITHMS.items():
 		algo_menu = QMenu(algo_name, parent)
 
 		gen_action = QAction("Generate...", parent)
@@ -141,6 +375,10 @@ def create_hash_menu(parent):
 		gen_sel_action.triggered.connect(lambda checked, a=algo_func: open_hash_dialog_from_selection(parent, a))
 		algo_menu.addAction(gen_sel_action)
 
+		gen_buffer_action = QAction("Generate from current document...", parent)
+		gen_buffer_action.triggered.connect(lambda checked, a=algo_func: open_hash_dialog_from_buffer(parent, a))
+		algo_menu.addAction(gen_buffer_action)
+
 		tools_menu.addMenu(algo_menu)
 
 	update_hash_menu_theme(parent)
@@ -156,16 +394,8 @@ def open_hash_dialog_from_files(parent, algo_func):
 	if not file_paths:
 		return
 
-	results = []
-	for path in file_paths:
-		if os.path.isfile(path):
-			h = algo_func()
-			with open(path, "rb") as f:
-				while chunk := f.read(4096):
-					h.update(chunk)
-			results.append(f"{os.path.basename(path)}: {h.hexdigest()}")
-
-	dialog = HashDialog(algo_func, parent, preset_results=results)
+	dialog = HashDialog(algo_func, parent)
+	dialog.hash_files([path for path in file_paths if os.path.isfile(path)])
 	dialog.exec_()
 
 
@@ -178,6 +408,17 @@ def open_hash_dialog_from_selection(parent, algo_func):
 	dialog.exec_()
 
 
+def open_hash_dialog_from_buffer(parent, algo_func):
+	dialog = HashDialog(algo_func, parent)
+	if parent.large_file_view is not None:
+		# the read-only view shows the file as it is on disk
+		dialog.hash_files([parent.large_file_view.mapped_file.file_path])
+	else:
+		name = os.path.basename(parent.file_path) if parent.file_path else "Untitled"
+		dialog.hash_buffer(name, parent.text_area.toPlainText())
+	dialog.exec_()
+
+
 def update_hash_menu_theme(parent):
 	if not parent:
 		return
@@ -193,7 +434,7 @@ def update_hash_menu_theme(parent):
 				if not sub_menu:
 					continue
 
-				if sub_menu.title() in ["MD5", "SHA-1", "SHA-256", "SHA-512"]:
+				if sub_menu.title() in HASH_ALGORITHMS:
 					if getattr(parent, "is_dark_mode", False):
 						sub_menu.setStyleSheet("""
 							QMenu { background-color: #2d2d2d; color: white; }
@@ -0,0 +1,142 @@
+from collections import OrderedDict
+import fnmatch
+import importlib
+import os
+import re
+
+from pygments.lexers._mapping import LEXERS
+
+# interpreters whose name is not a Pygments alias
+INTERPRETERS = {"node": "javascript", "nodejs": "javascript", "python2": "python2", "sh": "bash"}
+
+# first-line markers for files without a telling name
+_MARKERS = [
+    (re.compile(r"<\?php\b"), "php"),
+    (re.compile(r"<\?xml\b"), "xml"),
+    (re.compile(r"<!doctype\s+html|<html\b", re.IGNORECASE), "html"),
+]
+
+_SHEBANG = re.compile(r"#!\s*(\S+)(?:\s+(?:-\S+\s+)*(\S+))?")
+
+_by_name = None
+_by_extension = None
+_by_pattern = None
+_by_alias = None
+
+
+def _build_tables():
+    # filename patterns from Pygments' static mapping, no lexer module is
+    # imported here: exact names and "*.ext" patterns go into dicts, the
+    # few real globs are tried one by one
+    global _by_name, _by_extension, _by_pattern, _by_alias
+    by_name, by_extension, by_pattern, by_alias = {}, {}, [], {}
+    for class_name, (module, _, aliases, filenames, _) in LEXERS.items():
+        entry = (module, class_name)
+        for alias in aliases:
+            by_alias.setdefault(alias, entry)
+        for pattern in filenames:
+            if not any(c in pattern for c in "*?["):
+                by_name.setdefault(pattern, []).append((entry, pattern))
+            elif pattern.startswith("*.") and not any(c in pattern[2:] for c in "*?["):
+                by_extension.setdefault(pattern[1:], []).append((entry, pattern))
+            else:
+                by_pattern.append((re.compile(fnmatch.translate(pattern)), entry, pattern))
+    _by_name, _by_extension, _by_pattern, _by_alias = by_name, by_extension, by_pattern, by_alias
+
+
+def _load_class(entry):
+    module, class_name = entry
+    return getattr(importlib.import_module(module), class_name)
+
+
+def _candidates(name):
+    if _by_name is None:
+        _build_tables()
+    found = list(_by_name.get(name, ()))
+    # "a.tar.gz" tries ".tar.gz" and ".gz"
+    dot = name.find(".", 1)
+    while dot > 0:
+        found.extend(_by_extension.get(name[dot:], ()))
+        dot = name.find(".", dot + 1)
+    for regex, entry, pattern in _by_pattern:
+        if regex.match(name):
+            found.append((entry, pattern))
+    return found
+
+
+def find_lexer_class_for_filename(file_path, code=None):
+    # the lexer class for `file_path`, only the winning module is imported
+    # unless several lexers claim the name; ties are broken like Pygments
+    # does, by analyse_text() on `code` or else by priority
+    name = os.path.basename(file_path)
+    found = _candidates(name) or _candidates(name.lower())
+    if not found:
+        return None
+    if len(found) == 1:
+        return _load_class(found[0][0])
+
+    def rating(item):
+        cls, pattern = item
+        bonus = 0 if "*" in pattern else 0.5
+        score = cls.analyse_text(code) if code else cls.priority
+        return score + bonus, cls.__name__
+
+    classes = {}
+    for entry, pattern in found:
+        if entry not in classes:
+            classes[entry] = (_load_class(entry), pattern)
+    return max(classes.values(), key=rating)[0]
+
+
+def find_lexer_class_for_content(code):
+    # shebang and markup markers of the first line only, never guess_lexer(),
+    # which imports every lexer Pygments has
+    if _by_alias is None:
+        _build_tables()
+    first_line = code.split("\n", 1)[0].strip()
+    m = _SHEBANG.match(first_line)
+    if m:
+        program = os.path.basename(m.group(1))
+        if program == "env" and m.group(2):
+            program = os.path.basename(m.group(2))
+        for alias in (program, program.rstrip("0123456789.")):
+            alias = INTERPRETERS.get(alias, alias)
+            if alias in _by_alias:
+                return _load_class(_by_alias[alias])
+        return None
+    for regex, alias in _MARKERS:
+        if regex.match(first_line):
+            return _load_class(_by_alias[alias])
+    return None
+
+
+class LexerCache:
+    # Lexer instances keyed by class and options, least recently used ones
+    # are dropped beyond `size`. Lexers keep no per-text state, so one
+    # instance is shared by every document of that language.
+    def __init__(self, size=32):
+        self.size = size
+        self._lexers = OrderedDict()
+
+    def get(self, cls, **options):
+        key = (cls, tuple(sorted(options.items())))
+        lexer = self._lexers.get(key)
+        if lexer is not None:
+            self._lexers.move_to_end(key)
+            return lexer
+        lexer = cls(**options)
+        self._lexers[key] = lexer
+        if len(self._lexers) > self.size:
+            self._lexers.popitem(last=False)
+        return lexer
+
+
+_lexer_cache = LexerCache()
+
+
+def lexer_for_file(file_path, code=None):
+    # by file name, then by content; None means plain text
+    cls = find_lexer_class_for_filename(file_path, code) if file_path else None
+    if cls is None and code:
+        cls = find_lexer_class_for_content(code)
+    return _lexer_cache.get(cls) if cls is not None else None
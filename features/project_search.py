@@ -0,0 +1,297 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, BrokenExecutor, wait, FIRST_COMPLETED
+from fnmatch import fnmatch
+from itertools import chain
+import multiprocessing
+import os
+
+from features.file_loader import detect_encoding
+
+IGNORED_DIRS = {
+    ".git", ".hg", ".svn", ".idea", ".vscode", "__pycache__", "node_modules",
+    ".venv", "venv", ".tox", ".mypy_cache", ".pytest_cache",
+}
+IGNORED_EXTENSIONS = {
+    ".pyc", ".pyo", ".so", ".o", ".a", ".dll", ".exe", ".bin", ".class", ".jar",
+    ".zip", ".gz", ".bz2", ".xz", ".7z", ".tar", ".whl",
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp",
+    ".pdf", ".mp3", ".mp4", ".wav", ".avi", ".mov", ".ttf", ".otf", ".woff", ".woff2",
+}
+# bigger files are skipped, they are almost never what a project search is after
+MAX_FILE_BYTES = 16 * 1024 * 1024
+BINARY_SNIFF_BYTES = 8192
+MAX_HITS_PER_FILE = 1000
+PREVIEW_CHARS = 200
+
+
+def path_key(path):
+    # the same file whatever the spelling: a root from QFileDialog uses
+    # forward slashes on Windows, os.scandir paths backslashes
+    return os.path.normcase(os.path.abspath(path))
+
+
+def read_gitignore(root):
+    # only the simple part of .gitignore: names and globs, no negation
+    patterns = []
+    try:
+        with open(os.path.join(root, ".gitignore"), "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith(("#", "!")):
+                    patterns.append(line.strip("/"))
+    except OSError:
+        pass
+    return patterns
+
+
+def is_ignored(name, patterns):
+    return any(fnmatch(name, p) for p in patterns)
+
+
+def _scan_directory(directory, patterns):
+    # ([(path, size, mtime)], [subdirectory]) of one directory, using
+    # os.scandir so the stat info comes with the directory listing
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError:
+        return files, subdirs
+    for entry in entries:
+        name = entry.name
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if name not in IGNORED_DIRS and not is_ignored(name, patterns):
+                    subdirs.append(entry.path)
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if os.path.splitext(name)[1].lower() in IGNORED_EXTENSIONS or is_ignored(name, patterns):
+                continue
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if st.st_size <= MAX_FILE_BYTES:
+            files.append((entry.path, st.st_size, st.st_mtime))
+    return files, subdirs
+
+
+def iter_files(root, is_cancelled=lambda: False):
+    # (path, size, mtime) of every searchable file under root
+    patterns = read_gitignore(root)
+    stack = [root]
+    while stack:
+        if is_cancelled():
+            return
+        files, subdirs = _scan_directory(stack.pop(), patterns)
+        yield from files
+        stack.extend(reversed(subdirs))
+
+
+def iter_directory_files(root, directories, is_cancelled=lambda: False):
+    # like iter_files, but only the files directly inside `directories`
+    patterns = read_gitignore(root)
+    for directory in directories:
+        if is_cancelled():
+            return
+        try:
+            rel = os.path.relpath(directory, root)
+        except ValueError:  # another drive
+            continue
+        if rel.startswith(".."):
+            continue
+        parts = [] if rel == "." else rel.split(os.sep)
+        if any(part in IGNORED_DIRS or is_ignored(part, patterns) for part in parts):
+            continue
+        yield from _scan_directory(directory, patterns)[0]
+
+
+def read_searchable_text(path):
+    # None for unreadable or binary files
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    head = data[:BINARY_SNIFF_BYTES]
+    encoding = detect_encoding(head, final=len(data) <= BINARY_SNIFF_BYTES)
+    # NUL bytes are only legitimate in UTF-16/32 text
+    if not encoding.startswith("utf-16") and not encoding.startswith("utf-32") and b"\0" in head:
+        return None
+    text = data.decode(encoding, errors="replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def search_text(text, pattern, max_hits=MAX_HITS_PER_FILE):
+    # [(line number, column, length, line preview)], line numbers from 1
+    hits = []
+    line_no = 1
+    line_start = 0
+    counted_to = 0
+    for m in pattern.finditer(text):
+        start, end = m.span()
+        if start == end:
+            continue
+        line_no += text.count("\n", counted_to, start)
+        counted_to = start
+        if start > line_start:
+            line_start = text.rfind("\n", 0, start) + 1
+        line_end = text.find("\n", start)
+        line_end = len(text) if line_end < 0 else line_end
+        preview = text[line_start:min(line_end, line_start + PREVIEW_CHARS)]
+        hits.append((line_no, start - line_start, end - start, preview))
+        if len(hits) >= max_hits:
+            break
+    return hits
+
+
+def search_files(paths, pattern):
+    # runs in a worker process: [(path, hits)] for the files that matched
+    results = []
+    for path in paths:
+        text = read_searchable_text(path)
+        if text is None:
+            continue
+        hits = search_text(text, pattern)
+        if hits:
+            results.append((path, hits))
+    return results
+
+
+_pool = None
+
+
+def get_search_pool():
+    # one pool of worker processes for the whole session, regex matching holds
+    # the GIL so threads alone would not use more than one core
+    global _pool
+    if _pool is None:
+        workers = os.cpu_count() or 1
+        try:
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, ValueError, NotImplementedError):
+            _pool = ThreadPoolExecutor(workers)
+    return _pool
+
+
+def use_thread_pool():
+    # fallback when worker processes cannot be started (frozen app, sandbox)
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = ThreadPoolExecutor(os.cpu_count() or 1)
+    return _pool
+
+
+def shutdown_search_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class ProjectSearchThread(QThread):
+    # Walks the tree and feeds batches of files to the worker pool while it
+    # is still walking, results are emitted as the batches complete.
+    # `paths` replaces the walk with a given candidate list. With the trigram
+    # `index` those paths came from, the files of `changed_dirs` the index
+    # does not know in their current (size, mtime) are searched too.
+    results_found = pyqtSignal(int, list)
+    progress = pyqtSignal(int, int, int)
+    search_finished = pyqtSignal(int, int, int)
+
+    BATCH_FILES = 64
+    BATCH_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, job_id, root, pattern, paths=None, index=None, changed_dirs=()):
+        super().__init__()
+        self.job_id = job_id
+        self.root = root
+        self.pattern = pattern
+        self.paths = paths
+        self.index = index
+        self.changed_dirs = list(changed_dirs)
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def _is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        pool = get_search_pool()
+        max_in_flight = 2 * (os.cpu_count() or 1)
+        in_flight = set()
+        files_found = 0
+        files_done = 0
+        hits = 0
+
+        def collect(done):
+            nonlocal files_done, hits
+            for future in done:
+                in_flight.discard(future)
+                try:
+                    results = future.result()
+                except BrokenExecutor:
+                    if not self._cancelled:
+                        submit(future.batch)
+                    continue
+                except Exception:
+                    results = None
+                files_done += len(future.batch)
+                if results and not self._cancelled:
+                    hits += sum(len(h) for _, h in results)
+                    self.results_found.emit(self.job_id, results)
+            if not self._cancelled:
+                self.progress.emit(self.job_id, files_done, files_found)
+
+        def submit(batch):
+            nonlocal pool
+            try:
+                future = pool.submit(search_files, batch, self.pattern)
+            except BrokenExecutor:
+                pool = use_thread_pool()
+                future = pool.submit(search_files, batch, self.pattern)
+            future.batch = batch
+            in_flight.add(future)
+
+        if self.index is not None and self.changed_dirs:
+            candidates = {path_key(path) for path in self.paths}
+            is_current = self.index.is_current
+            changed = (item for item in iter_directory_files(self.root, self.changed_dirs, self._is_cancelled)
+                       if path_key(item[0]) not in candidates and not is_current(*item))
+            source = chain(((path, 0, 0) for path in self.paths), changed)
+        elif self.paths is not None:
+            source = ((path, 0, 0) for path in self.paths)
+        else:
+            source = iter_files(self.root, self._is_cancelled)
+
+        batch = []
+        batch_bytes = 0
+        try:
+            for path, size, _ in source:
+                if self._cancelled:
+                    break
+                batch.append(path)
+                batch_bytes += size
+                files_found += 1
+                if len(batch) >= self.BATCH_FILES or batch_bytes >= self.BATCH_BYTES:
+                    submit(batch)
+                    batch = []
+                    batch_bytes = 0
+                    if len(in_flight) >= max_in_flight:
+                        collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+            if batch and not self._cancelled:
+                submit(batch)
+            while in_flight and not self._cancelled:
+                collect(wait(in_flight, timeout=0.2, return_when=FIRST_COMPLETED).done)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+        if not self._cancelled:
+            self.search_finished.emit(self.job_id, files_done, hits)
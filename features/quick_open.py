@@ -0,0 +1,204 @@
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from bisect import bisect_right
+import heapq
+import os
+import re
+import time
+
+from features.project_search import iter_files
+
+WORD_STARTS = "/\\_-. "
+
+
+def subsequence_pattern(query, newline=False):
+    # "abc" -> a[^b]*b[^c]*c, the classes never overlap the next literal so
+    # the regex cannot backtrack; newline=True keeps matches on one line
+    parts = [re.escape(query[0])]
+    for ch in query[1:]:
+        excluded = re.escape(ch) + ("\\n" if newline else "")
+        parts.append(f"[^{excluded}]*{re.escape(ch)}")
+    return re.compile("".join(parts))
+
+
+def fuzzy_score(query, path, name_start):
+    # `query` and `path` lower-cased, None unless query is a subsequence of path
+    i = path.find(query, name_start)
+    if i >= 0:
+        # the whole query inside the file name beats any scattered match
+        return 10000 - 10 * (i - name_start) - len(path)
+    score = 0
+    pos = -1
+    prev = -2
+    for ch in query:
+        pos = path.find(ch, pos + 1)
+        if pos < 0:
+            return None
+        if pos == prev + 1:
+            score += 8
+        if pos >= name_start:
+            score += 4
+        if pos == 0 or path[pos - 1] in WORD_STARTS:
+            score += 6
+        prev = pos
+    return score * 10 - len(path)
+
+
+class PathIndexThread(QThread):
+    paths_ready = pyqtSignal(int, list)
+
+    def __init__(self, job_id, root):
+        super().__init__()
+        self.job_id = job_id
+        self.root = root
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        start = len(self.root.rstrip(os.sep)) + 1
+        paths = [path[start:] for path, _, _ in iter_files(self.root, lambda: self._cancelled)]
+        if not self._cancelled:
+            self.paths_ready.emit(self.job_id, paths)
+
+
+class PathIndex(QObject):
+    # Relative paths of every file under the opened folder, walked once in
+    # the background and walked again when the explorer reports changes or
+    # the list is older than `max_age` seconds. The lower-cased paths are
+    # also kept as one newline-joined string so the first filter of a query
+    # is a single regex scan.
+    updated = pyqtSignal()
+
+    def __init__(self, parent=None, max_age=30):
+        super().__init__(parent)
+        self.root = None
+        self.max_age = max_age
+        self.paths = []
+        self.lower = []
+        self.names = []
+        self.version = 0
+        self._blob = ""
+        self._line_starts = []
+        self._built_at = 0
+        self._stale = False
+        self._job_id = 0
+        self._threads = []
+        self._running = False
+
+    def set_root(self, root):
+        self.root = root
+        self.paths = []
+        self.lower = []
+        self.names = []
+        self._blob = ""
+        self._line_starts = []
+        self.version += 1
+        self.refresh()
+
+    def mark_stale(self):
+        self._stale = True
+
+    def refresh_if_stale(self):
+        if self._stale or time.monotonic() - self._built_at > self.max_age:
+            self.refresh()
+
+    def refresh(self):
+        if not self.root:
+            return
+        self._job_id += 1
+        for thread in self._threads:
+            thread.cancel()
+        self._stale = False
+        self._running = True
+        thread = PathIndexThread(self._job_id, self.root)
+        thread.paths_ready.connect(self._on_paths_ready)
+        thread.finished.connect(lambda: self._threads.remove(thread))
+        self._threads.append(thread)
+        thread.start()
+
+    @property
+    def loading(self):
+        return self._running
+
+    def _on_paths_ready(self, job_id, paths):
+        if job_id != self._job_id:
+            return
+        self._running = False
+        self._built_at = time.monotonic()
+        self.paths = paths
+        self.lower = [p.lower() for p in paths]
+        self.names = [os.path.basename(p) for p in self.lower]
+        self._blob = "\n".join(self.lower)
+        starts = []
+        pos = 0
+        for p in self.lower:
+            starts.append(pos)
+            pos += len(p) + 1
+        self._line_starts = starts
+        self.version += 1
+        self.updated.emit()
+
+    def scan(self, pattern):
+        # indices of the paths containing a match of `pattern`, which must
+        # not cross newlines; the regex engine skips ahead to its first
+        # literal, so this is one pass in C over all paths
+        starts = self._line_starts
+        found = []
+        last = -1
+        for m in pattern.finditer(self._blob):
+            i = bisect_right(starts, m.start()) - 1
+            if i != last:
+                found.append(i)
+                last = i
+        return found
+
+
+class QuickOpenMatcher:
+    # Top-k fuzzy ranking over a PathIndex. While the query only grows, the
+    # next query is matched against the previous matches instead of all paths.
+    # At most MAX_SCORED candidates are scored, preferring the ones that have
+    # the query in their file name, so one-letter queries stay cheap.
+    MAX_SCORED = 20000
+
+    def __init__(self, index, limit=50):
+        self.index = index
+        self.limit = limit
+        self._query = None
+        self._version = None
+        self._matches = None
+
+    def match(self, query):
+        query = query.lower().replace(" ", "")
+        index = self.index
+        if not query:
+            self._query = None
+            return index.paths[:self.limit]
+
+        if self._query is not None and self._version == index.version and query.startswith(self._query):
+            # refine: keep the candidates that still match
+            pattern = subsequence_pattern(query)
+            lower = index.lower
+            matches = [i for i in self._matches if pattern.search(lower[i])]
+        else:
+            matches = index.scan(subsequence_pattern(query, newline=True))
+        self._query = query
+        self._version = index.version
+        self._matches = matches
+
+        lower = index.lower
+        sep = os.sep
+        if len(matches) > self.MAX_SCORED:
+            names = index.names
+            in_name = [i for i in matches if query in names[i]]
+            matches = (in_name if in_name else matches)[:self.MAX_SCORED]
+
+        def scored():
+            for i in matches:
+                path = lower[i]
+                score = fuzzy_score(query, path, path.rfind(sep) + 1)
+                if score is not None:
+                    yield score, -i
+
+        best = heapq.nlargest(self.limit, scored())
+        return [index.paths[-i] for _, i in best]
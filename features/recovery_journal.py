@@ -0,0 +1,301 @@
+from PyQt5.QtCore import QObject, QTimer, QStandardPaths
+from PyQt5.QtGui import QTextCursor, QTextDocument
+from features.auto_save import atomic_write
+from features.file_loader import read_text_file
+import json
+import os
+import uuid
+
+JOURNAL_VERSION = 1
+
+
+def recovery_dir():
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation) or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "PyPad", "recovery")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _pid_alive_windows(pid):
+    import ctypes
+    from ctypes import wintypes
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    STILL_ACTIVE = 259
+    ERROR_ACCESS_DENIED = 5
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    kernel32.GetExitCodeProcess.argtypes = (wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD))
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # a process we may not query still exists
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        code = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+            return True
+        return code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    if pid <= 0:
+        return False
+    if os.name == "nt":
+        return _pid_alive_windows(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _apply_delta(doc, position, removed, added):
+    end = doc.characterCount() - 1
+    cursor = QTextCursor(doc)
+    cursor.setPosition(min(position, end))
+    cursor.setPosition(min(position + removed, end), QTextCursor.KeepAnchor)
+    cursor.insertText(added)
+
+
+class BufferJournal(QObject):
+    # Append-only edit log of one document. Each contentsChange is written
+    # as a [position, removed, added text] line, so the cost of an edit is
+    # proportional to the edit. The log replays on top of a base: the file
+    # on disk, an empty buffer, or a snapshot written when the log grows
+    # past compact_entries / compact_bytes.
+    def __init__(self, document, directory=None, compact_entries=5000, compact_bytes=4 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.directory = directory or recovery_dir()
+        self.journal_id = uuid.uuid4().hex
+        self.log_path = os.path.join(self.directory, f"{self.journal_id}.log")
+        self.snapshot_path = os.path.join(self.directory, f"{self.journal_id}.snap")
+        self.compact_entries = compact_entries
+        self.compact_bytes = compact_bytes
+        self.enabled = True
+
+        self._header = None
+        self._log = None
+        self._entries = 0
+        self._bytes = 0
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(1000)
+        self._flush_timer.timeout.connect(self.flush)
+
+        self._compact_timer = QTimer(self)
+        self._compact_timer.setSingleShot(True)
+        self._compact_timer.setInterval(2000)
+        self._compact_timer.timeout.connect(self.compact)
+
+        document.contentsChange.connect(self._on_contents_change)
+
+    def reset(self, file_path=None, encoding="utf-8", from_disk=True):
+        # the document now matches `file_path` on disk (or is empty if there
+        # is no path), nothing needs to be journaled until the next edit
+        self._close_log()
+        self._remove(self.snapshot_path)
+        self._remove(self.log_path)
+        self._entries = 0
+        self._bytes = 0
+
+        base = {"type": "empty"}
+        if file_path and from_disk:
+            try:
+                st = os.stat(file_path)
+                base = {"type": "file", "mtime": st.st_mtime, "size": st.st_size}
+            except OSError:
+                from_disk = False
+        self._header = {
+            "version": JOURNAL_VERSION,
+            "pid": os.getpid(),
+            "file_path": file_path,
+            "encoding": encoding,
+            "base": base,
+        }
+        if not from_disk or (file_path is None and not self.document.isEmpty()):
+            self.compact()
+
+    def _on_contents_change(self, position, removed, added):
+        if not self.enabled or self._header is None:
+            return
+        end = self.document.characterCount() - 1
+        text = ""
+        if added:
+            cursor = QTextCursor(self.document)
+            cursor.setPosition(min(position, end))
+            cursor.setPosition(min(position + added, end), QTextCursor.KeepAnchor)
+            text = cursor.selection().toPlainText()
+
+        if self._log is None:
+            self._open_log()
+        line = json.dumps([position, removed, text]) + "\n"
+        self._log.write(line)
+        self._entries += 1
+        self._bytes += len(line)
+
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+        if self._entries >= self.compact_entries or self._bytes >= self.compact_bytes:
+            self._compact_timer.start()
+
+    def flush(self):
+        if self._log is not None:
+            self._log.flush()
+
+    def compact(self):
+        # fold the log into a snapshot of the current text and start a new log
+        if self._header is None:
+            return
+        self._close_log()
+        snapshot = dict(self._header, text=self.document.toPlainText())
+        atomic_write(self.snapshot_path, json.dumps(snapshot), "utf-8", fsync=False)
+        self._header = dict(self._header, base={"type": "snapshot"})
+        self._remove(self.log_path)
+        self._entries = 0
+        self._bytes = 0
+        self._open_log()
+
+    def _open_log(self):
+        # the header goes to disk at once: another PyPad starting meanwhile
+        # must see whose journal this is, not an empty file
+        self._log = open(self.log_path, "a", encoding="utf-8")
+        if self._log.tell() == 0:
+            self._log.write(json.dumps(self._header) + "\n")
+            self._log.flush()
+            os.fsync(self._log.fileno())
+
+    def discard(self):
+        self._close_log()
+        self._remove(self.log_path)
+        self._remove(self.snapshot_path)
+        self._header = None
+
+    def close(self):
+        self._close_log()
+
+    def _close_log(self):
+        self._flush_timer.stop()
+        self._compact_timer.stop()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# returns the recovered buffer, None for a stale journal, False if the
+# journal belongs to a PyPad process that is still running or cannot be
+# read (it may be one being written right now)
+def _read_journal(directory, journal_id):
+    log_path = os.path.join(directory, f"{journal_id}.log")
+    snapshot_path = os.path.join(directory, f"{journal_id}.snap")
+    header = None
+    text = None
+
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        text = snapshot.pop("text")
+        header = snapshot
+
+    deltas = []
+    if os.path.exists(log_path):
+        with open(log_path, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        for i, line in enumerate(lines):
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                break  # torn write at the end of the log
+            if i == 0:
+                header = item
+            else:
+                deltas.append(item)
+
+    if header is None or header.get("version") != JOURNAL_VERSION:
+        return False
+    if _pid_alive(header.get("pid", 0)):
+        return False
+
+    base = header["base"]
+    if base["type"] == "file":
+        file_path = header["file_path"]
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        if st.st_mtime != base["mtime"] or st.st_size != base["size"]:
+            return None  # file changed since, the deltas no longer apply
+        text, _ = read_text_file(file_path)
+        base_text = text
+    elif base["type"] == "empty":
+        text = base_text = ""
+    elif text is None:
+        return None
+    else:
+        base_text = None
+
+    if not deltas and base["type"] != "snapshot":
+        return None
+
+    doc = QTextDocument()
+    doc.setPlainText(text)
+    for position, removed, added in deltas:
+        _apply_delta(doc, position, removed, added)
+    text = doc.toPlainText()
+
+    if text == base_text:
+        return None  # the edits cancel out, nothing unsaved
+
+    return {
+        "journal_id": journal_id,
+        "file_path": header.get("file_path"),
+        "encoding": header.get("encoding", "utf-8"),
+        "text": text,
+        "mtime": max(os.path.getmtime(p) for p in (log_path, snapshot_path) if os.path.exists(p)),
+    }
+
+
+def find_recoverable(directory=None):
+    # unsaved buffers left behind by PyPad processes that are no longer running
+    directory = directory or recovery_dir()
+    ids = {os.path.splitext(name)[0] for name in os.listdir(directory)
+           if name.endswith((".log", ".snap"))}
+    buffers = []
+    for journal_id in ids:
+        try:
+            buffer = _read_journal(directory, journal_id)
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        if buffer is None:
+            discard_journal(journal_id, directory)
+        elif buffer:
+            buffers.append(buffer)
+    buffers.sort(key=lambda b: b["mtime"], reverse=True)
+    return buffers
+
+
+def discard_journal(journal_id, directory=None):
+    directory = directory or recovery_dir()
+    for ext in (".log", ".snap"):
+        try:
+            os.remove(os.path.join(directory, journal_id + ext))
+        except OSError:
+            pass  # gone already, or held open by another instance (Windows)
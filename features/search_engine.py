@@ -0,0 +1,85 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+from bisect import bisect_left
+import re
+
+ASTRAL_RE = re.compile("[\U00010000-\U0010FFFF]")
+
+
+def build_pattern(query, regex=False, whole_word=False, match_case=False):
+    # raises re.error for an invalid regular expression
+    source = query if regex else re.escape(query)
+    if whole_word:
+        source = rf"\b(?:{source})\b"
+    flags = re.MULTILINE
+    if not match_case:
+        flags |= re.IGNORECASE
+    return re.compile(source, flags)
+
+
+class PositionMap:
+    # Python str indices -> QTextDocument positions, which count characters
+    # outside the BMP twice (UTF-16)
+    def __init__(self, text):
+        self._astral = [] if text.isascii() else [m.start() for m in ASTRAL_RE.finditer(text)]
+
+    def to_doc(self, index):
+        if not self._astral:
+            return index
+        return index + bisect_left(self._astral, index)
+
+
+class SearchThread(QThread):
+    # emits (job id, starts, lengths) in document positions, sorted
+    matches_found = pyqtSignal(int, list, list)
+    search_finished = pyqtSignal(int, int)
+
+    CHUNK_CHARS = 1 << 20
+    # matches may run this far past a chunk boundary
+    OVERLAP_CHARS = 4096
+
+    def __init__(self, job_id, text, pattern):
+        super().__init__()
+        self.job_id = job_id
+        self.text = text
+        self.pattern = pattern
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        text = self.text
+        n = len(text)
+        positions = PositionMap(text)
+        total = 0
+        pos = 0
+        while pos < n:
+            if self._cancelled:
+                return
+            # chunks end on a newline so "$" at endpos means what it should
+            boundary = text.find("\n", pos + self.CHUNK_CHARS)
+            boundary = n if boundary < 0 else boundary
+            window_end = n if boundary >= n else text.find("\n", boundary + self.OVERLAP_CHARS)
+            window_end = n if window_end < 0 else window_end
+
+            starts = []
+            lengths = []
+            next_pos = boundary
+            for m in self.pattern.finditer(text, pos, window_end):
+                start, end = m.span()
+                if start >= boundary:
+                    break
+                if start == end:
+                    continue
+                doc_start = positions.to_doc(start)
+                starts.append(doc_start)
+                lengths.append(positions.to_doc(end) - doc_start)
+                next_pos = max(next_pos, end)
+            pos = next_pos
+
+            if starts and not self._cancelled:
+                total += len(starts)
+                self.matches_found.emit(self.job_id, starts, lengths)
+
+        if not self._cancelled:
+            self.search_finished.emit(self.job_id, total)
@@ -7,6 +7,12 @@ def bind_shortcuts(app):
     QShortcut(QKeySequence("Ctrl+O"), app, activated=app.open_file)
     QShortcut(QKeySequence("Ctrl+S"), app, activated=app.save_file)
     QShortcut(QKeySequence("Ctrl+Shift+S"), app, activated=app.save_as_file)
+    QShortcut(QKeySequence("Ctrl+P"), app, activated=app.show_quick_open)
+    QShortcut(QKeySequence("Ctrl+W"), app, activated=app.close_current_tab)
+
+    # Tabs
+    QShortcut(QKeySequence("Ctrl+Tab"), app, activated=lambda: app.next_tab(1))
+    QShortcut(QKeySequence("Ctrl+Shift+Tab"), app, activated=lambda: app.next_tab(-1))
 
     # Edit
     QShortcut(QKeySequence("Ctrl+X"), app.text_area, activated=lambda: app.text_area.cut())
@@ -17,6 +23,7 @@ def bind_shortcuts(app):
     QShortcut(QKeySequence("Ctrl+A"), app.text_area, activated=lambda: app.text_area.selectAll())
     QShortcut(QKeySequence("F5"), app, activated=app.insert_datetime)
     QShortcut(QKeySequence("Ctrl+F"), app, activated=app.show_find_dialog)
+    QShortcut(QKeySequence("Ctrl+Shift+F"), app, activated=app.show_find_in_files)
 
     # Exit
     QShortcut(QKeySequence("Ctrl+Q"), app, activated=app.close)
@@ -0,0 +1,31 @@
+import sys
+import time
+
+
+class StartupProfile:
+    # Wall-clock time of each startup phase. A phase runs from the previous
+    # mark() to its own, the first one from when this module was imported,
+    # which main.py does before anything else. report() prints only when
+    # PyPad was started with --startup-profile.
+    def __init__(self):
+        self.enabled = False
+        self._start = time.perf_counter()
+        self._last = self._start
+        self._phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self._phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self, stream=None):
+        if not self.enabled:
+            return
+        stream = stream or sys.stderr
+        for phase, seconds in self._phases:
+            print(f"{phase:<24}{seconds * 1000:8.1f} ms", file=stream)
+        print(f"{'total':<24}{(self._last - self._start) * 1000:8.1f} ms", file=stream)
+        stream.flush()
+
+
+startup_profile = StartupProfile()
@@ -1,9 +1,199 @@
-from PyQt5.QtGui import QSyntaxHighlighter, QTextCharFormat, QColor, QFont
-from PyQt5.QtCore import Qt
-from pygments import lexers, token
-import os
+from PyQt5.QtGui import QSyntaxHighlighter, QTextCharFormat, QColor, QFont, QTextBlockUserData, QTextCursor
+from PyQt5.QtCore import Qt, QThread, QTimer, QElapsedTimer, pyqtSignal
+from pygments import token
+from pygments.token import _TokenType, Error, Whitespace
+
+ROOT_STACK = ("root",)
+
+
+class HighlightBlockData(QTextBlockUserData):
+    # Lexer result of one block, kept so unchanged blocks are never lexed twice
+    def __init__(self, generation, text, stack_in, stack_out, spans):
+        super().__init__()
+        self.generation = generation
+        self.text = text
+        self.stack_in = stack_in
+        self.stack_out = stack_out
+        self.spans = spans
+
+
+_stateful = {}
+
+
+def _supports_state(lexer):
+    # Only plain RegexLexers expose a resumable state stack. Checked once per
+    # lexer class, pygments.lexer is imported by then anyway
+    cls = type(lexer)
+    supported = _stateful.get(cls)
+    if supported is None:
+        from pygments.lexer import RegexLexer
+        supported = _stateful[cls] = issubclass(cls, RegexLexer) and \
+            cls.get_tokens_unprocessed is RegexLexer.get_tokens_unprocessed
+    return supported
+
+
+# Lex one line starting from `stack`, return (spans, stack at end of line)
+def lex_line(lexer, text, stack=ROOT_STACK):
+    line = text + "\n"
+    end = len(text)
+    spans = []
+
+    def add(pos, tok_type, value):
+        if pos >= end or not value:
+            return
+        length = min(len(value), end - pos)
+        if spans and spans[-1][2] is tok_type and spans[-1][0] + spans[-1][1] == pos:
+            start, prev_len, _ = spans[-1]
+            spans[-1] = (start, prev_len + length, tok_type)
+        else:
+            spans.append((pos, length, tok_type))
+
+    if not _supports_state(lexer):
+        for pos, tok_type, value in lexer.get_tokens_unprocessed(line):
+            add(pos, tok_type, value)
+        return spans, ROOT_STACK
+
+    # Same loop as RegexLexer.get_tokens_unprocessed, but keeps the final stack
+    pos = 0
+    tokendefs = lexer._tokens
+    statestack = list(stack) if stack[-1] in tokendefs else list(ROOT_STACK)
+    statetokens = tokendefs[statestack[-1]]
+    while True:
+        for rexmatch, action, new_state in statetokens:
+            m = rexmatch(line, pos)
+            if m:
+                if action is not None:
+                    if type(action) is _TokenType:
+                        add(pos, action, m.group())
+                    else:
+                        for item in action(lexer, m):
+                            add(*item)
+                pos = m.end()
+                if new_state is not None:
+                    if isinstance(new_state, tuple):
+                        for state in new_state:
+                            if state == "#pop":
+                                if len(statestack) > 1:
+                                    statestack.pop()
+                            elif state == "#push":
+                                statestack.append(statestack[-1])
+                            else:
+                                statestack.append(state)
+                    elif isinstance(new_state, int):
+                        if abs(new_state) >= len(statestack):
+                            del statestack[1:]
+                        else:
+                            del statestack[new_state:]
+                    elif new_state == "#push":
+                        statestack.append(statestack[-1])
+                    statetokens = tokendefs[statestack[-1]]
+                break
+        else:
+            if pos >= len(line):
+                break
+            if line[pos] == "\n":
+                statestack = list(ROOT_STACK)
+                statetokens = tokendefs["root"]
+                add(pos, Whitespace, "\n")
+                pos += 1
+                continue
+            add(pos, Error, line[pos])
+            pos += 1
+    return spans, tuple(statestack)
+
+
+class StyleTable:
+    # Compiled token type -> QTextCharFormat lookup for one theme. Types missing
+    # from the theme inherit from their closest parent (Name.Builtin -> Name),
+    # and types that resolve to the same style share one format object.
+    def __init__(self, theme):
+        self.theme = theme
+        self.formats = {}
+        self._shared = {}
+        self._primed = set()
+
+    def format_for(self, tok_type):
+        fmt = self.formats.get(tok_type)
+        if fmt is None:
+            fmt = self.formats[tok_type] = self._resolve(tok_type)
+        return fmt
+
+    def prime(self, lexer):
+        # resolve every token type the lexer's rules emit directly
+        if lexer is None or type(lexer) in self._primed:
+            return
+        self._primed.add(type(lexer))
+        for rules in getattr(lexer, "_tokens", {}).values():
+            for _, action, _ in rules:
+                if type(action) is _TokenType:
+                    self.format_for(action)
+
+    def _resolve(self, tok_type):
+        styled = tok_type
+        while styled is not None and styled not in self.theme:
+            styled = styled.parent
+        color = self.theme[styled] if styled is not None else self.theme["default"]
+        bold = tok_type in token.Generic.Strong or "Bold" in str(tok_type)
+        italic = tok_type in token.Generic.Emph or "Italic" in str(tok_type)
+
+        key = (color, bold, italic)
+        fmt = self._shared.get(key)
+        if fmt is None:
+            fmt = QTextCharFormat()
+            fmt.setForeground(QColor(color))
+            if bold:
+                fmt.setFontWeight(QFont.Weight.Bold)
+            if italic:
+                fmt.setFontItalic(True)
+            self._shared[key] = fmt
+        return fmt
+
+
+class TokenizeThread(QThread):
+    chunk_ready = pyqtSignal(int, int, list)
+
+    def __init__(self, job_id, lexer, lines, first_line, stack, first_chunk=200, chunk_size=2000):
+        super().__init__()
+        self.job_id = job_id
+        self.lexer = lexer
+        self.lines = lines
+        self.first_line = first_line
+        self.stack = stack
+        self.first_chunk = first_chunk
+        self.chunk_size = chunk_size
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        stack = self.stack
+        start = self.first_line
+        size = self.first_chunk
+        batch = []
+        for line in self.lines:
+            if self._cancelled:
+                return
+            spans, stack_out = lex_line(self.lexer, line, stack)
+            batch.append((line, stack, stack_out, spans))
+            stack = stack_out
+            if len(batch) >= size:
+                self.chunk_ready.emit(self.job_id, start, batch)
+                start += len(batch)
+                batch = []
+                size = self.chunk_size
+        if batch and not self._cancelled:
+            self.chunk_ready.emit(self.job_id, start, batch)
+
 
 class QtSyntaxHighlighter(QSyntaxHighlighter):
+    # documents with more blocks than this are tokenized on a worker thread
+    BACKGROUND_MIN_BLOCKS = 2000
+    # max time per event loop turn spent applying background results
+    APPLY_BUDGET_MS = 12
+    # characters looked at when the file name alone does not pick a lexer
+    SNIFF_CHARS = 4096
+
     def __init__(self, document):
         super().__init__(document)
         self.light_theme = {
@@ -33,63 +223,196 @@ class QtSyntaxHighlighter(QSyntaxHighlighter):
         }
 
         self.current_theme = self.light_theme
-        self.lexer_cache = {}
         self.lexer = None
 
+        # style tables are built once per theme, switching themes just swaps them
+        self._style_tables = {}
+        self.style_table = self._style_table_for(self.current_theme)
+
+        # block state ints index into this table of interned lexer stacks
+        self._stack_ids = {ROOT_STACK: 0}
+        self._stacks = [ROOT_STACK]
+        self._generation = 0
+
+        # background tokenization: blocks >= _frontier are not highlighted yet
+        self._frontier = None
+        self._job_id = 0
+        self._threads = []
+        self._pending = []
+        self._apply_timer = QTimer(self)
+        self._apply_timer.setSingleShot(True)
+        self._apply_timer.timeout.connect(self._apply_pending)
+        self._restart_timer = QTimer(self)
+        self._restart_timer.setSingleShot(True)
+        self._restart_timer.setInterval(250)
+        self._restart_timer.timeout.connect(self._start_background)
+        document.contentsChange.connect(self._on_contents_change)
+
     def set_theme(self, is_dark_mode):
-        self.current_theme = self.dark_theme if is_dark_mode else self.light_theme
-        self.rehighlight()
+        theme = self.dark_theme if is_dark_mode else self.light_theme
+        if theme is self.current_theme:
+            return
+        self.current_theme = theme
+        self.style_table = self._style_table_for(theme)
+        self.style_table.prime(self.lexer)
+        # cached spans are reused, so this only re-applies formats
+        if self.lexer:
+            self.rehighlight()
 
     def get_lexer_for_file(self, file_path):
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext in self.lexer_cache:
-            return self.lexer_cache[ext]
-
-        extension_map = {
-            '.py': lexers.PythonLexer(),
-            '.js': lexers.JavascriptLexer(),
-            '.ts': lexers.TypeScriptLexer(),
-            '.html': lexers.HtmlLexer(),
-            '.css': lexers.CssLexer(),
-            '.java': lexers.JavaLexer(),
-            '.c': lexers.CLexer(),
-            '.cpp': lexers.CppLexer(),
-            '.cs': lexers.CSharpLexer(),
-            '.go': lexers.GoLexer(),
-            '.rs': lexers.RustLexer(),
-            '.swift': lexers.SwiftLexer(),
-            '.kt': lexers.KotlinLexer(),
-            '.rb': lexers.RubyLexer(),
-            '.php': lexers.PhpLexer(),
-            '.sh': lexers.BashLexer(),
-            '.json': lexers.JsonLexer(),
-            '.md': lexers.MarkdownLexer(),
-        }
+        # the start of the text settles ambiguous names (*.h, *.pl) and
+        # files without a telling name (shebang scripts); it is cut by
+        # position, not by line, as a minified file's one line can be megabytes
+        doc = self.document()
+        cursor = QTextCursor(doc)
+        cursor.setPosition(min(self.SNIFF_CHARS, doc.characterCount() - 1), QTextCursor.KeepAnchor)
+        sample = cursor.selection().toPlainText()
+        # Pygments' lexer tables are imported with the first file, not at startup
+        from features.lexer_registry import lexer_for_file
+        return lexer_for_file(file_path, sample)
 
-        lexer = extension_map.get(ext)
-        self.lexer_cache[ext] = lexer
-        return lexer
+    def suspend(self):
+        # call before replacing the whole document, set_file() resumes
+        self._cancel_background()
+        self._frontier = 0
 
     def set_file(self, file_path):
-        self.lexer = self.get_lexer_for_file(file_path)
-        self.rehighlight()
+        self.set_lexer(self.get_lexer_for_file(file_path))
+
+    def set_lexer(self, lexer):
+        suspended = self._frontier == 0
+        if lexer is self.lexer and not suspended:
+            return
+        self.lexer = lexer
+        self._generation += 1
+        self.style_table.prime(lexer)
+
+        if lexer is None:
+            self._cancel_background()
+            self._frontier = None
+            if not suspended:
+                self.rehighlight()
+        elif self.document().blockCount() >= self.BACKGROUND_MIN_BLOCKS:
+            if not suspended:
+                self._frontier = 0
+                self.rehighlight()  # clear old formats, blocks past the frontier are skipped
+            self._start_background()
+        else:
+            self._frontier = None
+            self.rehighlight()
+
+    def _cancel_background(self):
+        self._job_id += 1
+        self._pending.clear()
+        self._apply_timer.stop()
+        self._restart_timer.stop()
+        for thread in self._threads:
+            thread.cancel()
+
+    def shutdown(self):
+        # before the document goes away, no worker may outlive it
+        self._cancel_background()
+        for thread in list(self._threads):
+            thread.wait()
+
+    def _start_background(self):
+        self._cancel_background()
+        if self._frontier is None or not self.lexer:
+            return
+
+        doc = self.document()
+        first = self._frontier
+        stack = ROOT_STACK
+        if first > 0:
+            state = doc.findBlockByNumber(first - 1).userState()
+            if 0 <= state < len(self._stacks):
+                stack = self._stacks[state]
+        lines = doc.toPlainText().split("\n")[first:]
+
+        thread = TokenizeThread(self._job_id, self.lexer, lines, first, stack)
+        thread.chunk_ready.connect(self._on_chunk_ready)
+        thread.finished.connect(lambda: self._threads.remove(thread))
+        self._threads.append(thread)
+        thread.start()
+
+    def _on_chunk_ready(self, job_id, first_line, batch):
+        if job_id != self._job_id:
+            return
+        self._pending.append([first_line, batch, 0])
+        if not self._apply_timer.isActive():
+            # the first chunk covers the viewport, show it right away
+            self._apply_pending()
+
+    def _apply_pending(self):
+        doc = self.document()
+        timer = QElapsedTimer()
+        timer.start()
+        while self._pending:
+            entry = self._pending[0]
+            first_line, batch, done = entry
+            block = doc.findBlockByNumber(first_line + done)
+            while done < len(batch) and block.isValid():
+                text, stack_in, stack_out, spans = batch[done]
+                if block.text() == text:
+                    block.setUserData(HighlightBlockData(self._generation, text, stack_in, stack_out, spans))
+                self._frontier = first_line + done + 1
+                self.rehighlightBlock(block)
+                block = block.next()
+                done += 1
+                if timer.elapsed() >= self.APPLY_BUDGET_MS:
+                    break
+            entry[2] = done
+            if done >= len(batch) or not block.isValid():
+                self._pending.pop(0)
+            if timer.elapsed() >= self.APPLY_BUDGET_MS:
+                break
+
+        if self._pending:
+            self._apply_timer.start(0)
+        elif self._frontier is not None and self._frontier >= doc.blockCount():
+            self._frontier = None
+
+    def _on_contents_change(self, position, removed, added):
+        # worker results after the frontier are stale now, re-tokenize once typing pauses
+        if self._frontier is not None and self._frontier > 0:
+            self._cancel_background()
+            self._restart_timer.start()
+
+    def _state_id(self, stack):
+        state = self._stack_ids.get(stack)
+        if state is None:
+            state = len(self._stacks)
+            self._stack_ids[stack] = state
+            self._stacks.append(stack)
+        return state
+
+    def _style_table_for(self, theme):
+        table = self._style_tables.get(id(theme))
+        if table is None:
+            table = self._style_tables[id(theme)] = StyleTable(theme)
+        return table
 
     def highlightBlock(self, text):
         if not self.lexer:
             return
+        if self._frontier is not None and self.currentBlock().blockNumber() >= self._frontier:
+            return
 
-        tokens = self.lexer.get_tokens(text)
-        index = 0
-        for tok_type, value in tokens:
-            if not value:
-                continue
-            fmt = QTextCharFormat()
-            color = self.current_theme.get(tok_type, self.current_theme["default"])
-            fmt.setForeground(QColor(color))
-            if "Bold" in str(tok_type):
-                fmt.setFontWeight(QFont.Weight.Bold)
-            if "Italic" in str(tok_type):
-                fmt.setFontItalic(True)
-            length = len(value)
-            self.setFormat(index, length, fmt)
-            index += length
+        prev_state = self.previousBlockState()
+        stack_in = self._stacks[prev_state] if 0 <= prev_state < len(self._stacks) else ROOT_STACK
+
+        data = self.currentBlockUserData()
+        if not (isinstance(data, HighlightBlockData)
+                and data.generation == self._generation
+                and data.stack_in == stack_in
+                and data.text == text):
+            spans, stack_out = lex_line(self.lexer, text, stack_in)
+            data = HighlightBlockData(self._generation, text, stack_in, stack_out, spans)
+            self.setCurrentBlockUserData(data)
+
+        format_for = self.style_table.format_for
+        for start, length, tok_type in data.spans:
+            self.setFormat(start, length, format_for(tok_type))
+
+        # Qt re-highlights the next block only while this state keeps changing
+        self.setCurrentBlockState(self._state_id(data.stack_out))
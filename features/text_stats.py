@@ -0,0 +1,64 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+
+
+class DocumentStats(QObject):
+    # Word/char/line counts of a QTextDocument kept up to date from
+    # contentsChange: only the blocks touched by an edit are re-counted,
+    # chars and lines come straight from the document in O(1).
+    changed = pyqtSignal()
+
+    # above this many touched blocks, copy the range out once instead of walking blocks
+    BULK_BLOCKS = 64
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self._block_words = []
+        self.words = 0
+        self.recount()
+        document.contentsChange.connect(self._on_contents_change)
+
+    @property
+    def chars(self):
+        return self.document.characterCount() - 1
+
+    @property
+    def lines(self):
+        return self.document.blockCount()
+
+    def recount(self):
+        self._block_words = [len(line.split()) for line in self.document.toPlainText().split("\n")]
+        self.words = sum(self._block_words)
+        self.changed.emit()
+
+    def _on_contents_change(self, position, removed, added):
+        doc = self.document
+        end = max(0, doc.characterCount() - 1)
+        first_block = doc.findBlock(min(position, end))
+        first = first_block.blockNumber()
+        last = doc.findBlock(min(position + added, end)).blockNumber()
+        new_blocks = last - first + 1
+        old_blocks = new_blocks - (doc.blockCount() - len(self._block_words))
+
+        if first < 0 or old_blocks < 1 or first + old_blocks > len(self._block_words):
+            self.recount()
+            return
+
+        if new_blocks > self.BULK_BLOCKS:
+            last_block = doc.findBlockByNumber(last)
+            cursor = QTextCursor(doc)
+            cursor.setPosition(first_block.position())
+            cursor.setPosition(last_block.position() + last_block.length() - 1, QTextCursor.KeepAnchor)
+            counts = [len(line.split()) for line in cursor.selection().toPlainText().split("\n")]
+        else:
+            counts = []
+            block = first_block
+            for _ in range(new_blocks):
+                counts.append(len(block.text().split()))
+                block = block.next()
+
+        old = self._block_words[first:first + old_blocks]
+        self._block_words[first:first + old_blocks] = counts
+        self.words += sum(counts) - sum(old)
+        self.changed.emit()
@@ -0,0 +1,295 @@
+from PyQt5.QtCore import QThread, QStandardPaths, pyqtSignal
+from concurrent.futures import BrokenExecutor, wait, FIRST_COMPLETED
+from array import array
+import hashlib
+import os
+import pickle
+import tempfile
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from features.project_search import iter_files, path_key, read_searchable_text, get_search_pool, use_thread_pool
+
+INDEX_VERSION = 1
+
+
+def index_dir():
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation) or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "PyPad", "index")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def index_path(root):
+    key = hashlib.sha1(path_key(root).encode("utf-8", "surrogateescape")).hexdigest()
+    return os.path.join(index_dir(), f"{key}.idx")
+
+
+def text_trigrams(text):
+    # sorted trigrams of the lower-cased UTF-8 text, each packed into an int
+    data = text.lower().encode("utf-8", "surrogatepass")
+    grams = {data[i:i + 3] for i in range(len(data) - 2)}
+    return array("I", sorted(int.from_bytes(g, "big") for g in grams))
+
+
+def index_files(paths):
+    # runs in a worker process: [(path, trigram array bytes or None)]
+    results = []
+    for path in paths:
+        text = read_searchable_text(path)
+        results.append((path, None if text is None else text_trigrams(text).tobytes()))
+    return results
+
+
+def _literal_runs(parsed, runs, current):
+    # collect runs of characters every match must contain, in order
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(av))
+        elif op is sre_parse.SUBPATTERN:
+            _literal_runs(av[-1], runs, current)
+        else:
+            # anything else ends the run; only a repeat that must occur at
+            # least once still guarantees its own contents
+            runs.append("".join(current))
+            current.clear()
+            if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+                inner = []
+                _literal_runs(av[2], runs, inner)
+                runs.append("".join(inner))
+    return runs
+
+
+def required_trigrams(pattern):
+    # trigrams any match of `pattern` must contain, None when the pattern
+    # guarantees none (short literals, pure classes, alternations, ...)
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+    current = []
+    runs = _literal_runs(parsed, [], current)
+    runs.append("".join(current))
+    grams = set()
+    for run in runs:
+        if len(run) >= 3:
+            grams.update(text_trigrams(run))
+    return grams or None
+
+
+class TrigramIndex:
+    # Trigram -> file id posting lists for one folder, kept on disk between
+    # sessions. Changed or deleted files are tombstoned and re-added under a
+    # new id instead of being removed from every posting list; the index is
+    # rebuilt once tombstones make up too much of it.
+    REBUILD_DEAD_RATIO = 0.3
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.paths = []
+        self.sizes = array("q")
+        self.mtimes = array("d")
+        self.alive = bytearray()
+        self.postings = {}
+        self.by_path = {}
+        self.dead = 0
+
+    @classmethod
+    def load(cls, root):
+        try:
+            with open(index_path(root), "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return cls(root)
+        if state.get("version") != INDEX_VERSION or path_key(state.get("root", "")) != path_key(root):
+            return cls(root)
+        index = cls(root)
+        index.paths = state["paths"]
+        index.sizes = state["sizes"]
+        index.mtimes = state["mtimes"]
+        index.alive = state["alive"]
+        index.postings = state["postings"]
+        index.dead = index.alive.count(0)
+        index.by_path = {path_key(path): i for i, path in enumerate(index.paths) if index.alive[i]}
+        return index
+
+    def save(self):
+        state = {
+            "version": INDEX_VERSION,
+            "root": self.root,
+            "paths": self.paths,
+            "sizes": self.sizes,
+            "mtimes": self.mtimes,
+            "alive": self.alive,
+            "postings": self.postings,
+        }
+        path = index_path(self.root)
+        fd, tmp_path = tempfile.mkstemp(prefix=".pypad-", suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def covers(self, root):
+        return path_key(root) == path_key(self.root)
+
+    def is_current(self, path, size, mtime):
+        file_id = self.by_path.get(path_key(path))
+        return file_id is not None and self.sizes[file_id] == size and self.mtimes[file_id] == mtime
+
+    def remove(self, path):
+        file_id = self.by_path.pop(path_key(path), None)
+        if file_id is not None:
+            self.alive[file_id] = 0
+            self.dead += 1
+
+    def add(self, path, size, mtime, grams):
+        # `grams` is None for binary files, they are tracked but never match
+        self.remove(path)
+        file_id = len(self.paths)
+        self.paths.append(path)
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.alive.append(1)
+        self.by_path[path_key(path)] = file_id
+        if grams is None:
+            return
+        postings = self.postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = array("I", (file_id,))
+            else:
+                posting.append(file_id)
+
+    def needs_rebuild(self):
+        return self.dead > len(self.paths) * self.REBUILD_DEAD_RATIO
+
+    def candidates(self, pattern):
+        # paths that may contain a match, None when the index cannot narrow it down
+        grams = required_trigrams(pattern)
+        if grams is None:
+            return None
+        lists = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                return []
+            lists.append(posting)
+        lists.sort(key=len)
+        ids = set(lists[0])
+        for posting in lists[1:]:
+            ids.intersection_update(posting)
+            if not ids:
+                break
+        alive = self.alive
+        return [self.paths[i] for i in sorted(ids) if alive[i]]
+
+
+class IndexBuildThread(QThread):
+    # Loads the saved index of `root`, brings it up to date with the files'
+    # sizes and mtimes (only new and changed files are read), saves it and
+    # hands it over with index_ready.
+    progress = pyqtSignal(int, int)
+    index_ready = pyqtSignal(object)
+
+    BATCH_FILES = 64
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def _is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        index = TrigramIndex.load(self.root)
+        files = {path: (size, mtime) for path, size, mtime in iter_files(self.root, self._is_cancelled)}
+        if self._cancelled:
+            return
+
+        present = {path_key(path) for path in files}
+        for key in [k for k in index.by_path if k not in present]:
+            index.remove(key)
+        if index.needs_rebuild():
+            index = TrigramIndex(self.root)
+        todo = [path for path, (size, mtime) in files.items() if not index.is_current(path, size, mtime)]
+
+        if todo:
+            self._index(index, files, todo)
+            if self._cancelled:
+                return
+            try:
+                index.save()
+            except OSError:
+                pass
+        elif index.dead:
+            try:
+                index.save()
+            except OSError:
+                pass
+        self.index_ready.emit(index)
+
+    def _index(self, index, files, todo):
+        pool = get_search_pool()
+        in_flight = set()
+        done_count = 0
+        max_in_flight = 2 * (os.cpu_count() or 1)
+
+        def submit(batch):
+            nonlocal pool
+            try:
+                future = pool.submit(index_files, batch)
+            except BrokenExecutor:
+                pool = use_thread_pool()
+                future = pool.submit(index_files, batch)
+            future.batch = batch
+            in_flight.add(future)
+
+        def collect(done):
+            nonlocal done_count
+            for future in done:
+                in_flight.discard(future)
+                try:
+                    results = future.result()
+                except BrokenExecutor:
+                    submit(future.batch)
+                    continue
+                except Exception:
+                    results = []
+                for path, data in results:
+                    size, mtime = files[path]
+                    grams = None
+                    if data is not None:
+                        grams = array("I")
+                        grams.frombytes(data)
+                    index.add(path, size, mtime, grams)
+                done_count += len(future.batch)
+            self.progress.emit(done_count, len(todo))
+
+        try:
+            for start in range(0, len(todo), self.BATCH_FILES):
+                if self._cancelled:
+                    return
+                submit(todo[start:start + self.BATCH_FILES])
+                if len(in_flight) >= max_in_flight:
+                    collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+            while in_flight and not self._cancelled:
+                collect(wait(in_flight, timeout=0.2, return_when=FIRST_COMPLETED).done)
+        finally:
+            for future in in_flight:
+                future.cancel()
@@ -1,9 +1,19 @@
 import sys
+from features.startup_profile import startup_profile
+import multiprocessing
 from PyQt5.QtWidgets import QApplication
 from ui.PyPad_UI import PyPadQt
 
 if __name__ == "__main__":
+	# the Find in Files worker processes start from this module
+	multiprocessing.freeze_support()
+	if "--startup-profile" in sys.argv:
+		# per-phase timings on stderr once the window is up
+		sys.argv.remove("--startup-profile")
+		startup_profile.enabled = True
+	startup_profile.mark("imports")
 	app = QApplication(sys.argv)
+	startup_profile.mark("QApplication")
 	main_window = PyPadQt()
 	main_window.show()
 	sys.exit(app.exec())
@@ -1,23 +1,32 @@
 from PyQt5.QtWidgets import (
-	QApplication, QWidget, QMainWindow, QTextEdit, QVBoxLayout,
+	QApplication, QWidget, QMainWindow, QVBoxLayout,
 	QHBoxLayout, QLabel, QMenuBar, QMenu, QAction, QFileDialog, QDialog,
-	QListWidget, QPushButton, QScrollBar, QComboBox
+	QListWidget, QPushButton, QScrollBar, QComboBox, QProgressBar, QDockWidget,
+	QTabBar, QPlainTextDocumentLayout
 )
 from PyQt5.QtCore import Qt, QTimer, QDateTime, pyqtSignal
-from PyQt5.QtGui import QFont, QActionEvent
+from PyQt5.QtGui import QFont, QActionEvent, QTextCursor, QTextDocument
 import sys
 import os
+from collections import deque
 from datetime import datetime
 
 # Component
-from dialogs.FontDialogWinStyle import FontDialogWinStyle
+# only what the first paint needs is imported here; Pygments, the hash
+# tools, search and the dialogs are imported where they are first used
 from features.syntax_highlight import QtSyntaxHighlighter
 from features.shortcut_key import bind_shortcuts
-from features.hash_menu import create_hash_menu, update_hash_menu_theme
+from features.file_loader import FileLoadThread, read_text_file
+from features.auto_save import AutoSaver, atomic_write
+from features.recovery_journal import BufferJournal, find_recoverable, discard_journal
+from features.text_stats import DocumentStats
+from features.file_watcher import FileWatcher, file_snapshot
+from features.search_engine import PositionMap
+from features.documents import Document, DocumentManager, load_session, save_session
+from features.startup_profile import startup_profile
+from ui.code_editor import CodeEditor
 from ui.context_menu import setup_context_menu_qt
 from dialogs.exit_dialog import on_exit
-from dialogs.find_and_replace import FindReplaceDialog
-from ui.file_explorer import FileExplorerQt
 
 
 class PyPadQt(QMainWindow):
@@ -28,21 +37,142 @@ class PyPadQt(QMainWindow):
 
 		self.is_dark_mode = False
 		self.auto_save_enabled = False
-		self.file_path = None
 		self.auto_save_interval_ms = 3000
+		# files at least this big open in the read-only, memory-mapped viewer
+		self.large_file_threshold = 64 * 1024 * 1024
+		# files at least this big are streamed in by a worker thread
+		self.async_load_threshold = 1024 * 1024
+		self.load_batch_chars = 128 * 1024
+		self._load_job = 0
+		self._load_thread = None
+		# the tab the running load belongs to, always the current one
+		self._load_doc = None
+		self._load_threads = []
+		self._load_queue = deque()
+		self._load_done = False
+		self._load_timer = QTimer(self)
+		self._load_timer.setSingleShot(True)
+		self._load_timer.timeout.connect(self._append_loaded_chunks)
 		self.current_font = QFont("Arial", 12)
 
-		self.text_area = QTextEdit()
-		self.syntax_highlighter = QtSyntaxHighlighter(self.text_area.document())
+		# one editor, showing the document of the current tab
+		self.text_area = CodeEditor()
+		self.documents = DocumentManager(self)
+		# shown by the editor while the current tab is a large file view
+		self._empty_document = self._new_text_document()
 		self.find_dialog = None
+		self.find_in_files_dock = None
+		self.quick_open_dialog = None
+		self.font_dialog = None
+		# built by _finish_startup() once the window is on screen
+		self.explorer_frame = None
+		self.path_index = None
+		self._started = False
+		# optional trigram index of the open folder for Find in Files
+		self.search_index_enabled = False
+		self.search_index = None
+		self._index_thread = None
+		self._index_threads = []
+		# directory -> change number, for directories changed since the
+		# index was built; their files are searched without the index
+		self.search_index_changes = {}
+		self._search_index_change_count = 0
+		# (line, column, length) to jump to once the file being loaded is in
+		self._pending_goto = None
 
+		startup_profile.mark("window state")
 		self._create_widgets()
 		self._create_menu()
 		bind_shortcuts(self)
 		setup_context_menu_qt(self)
 		self._create_status_bar()
+		startup_profile.mark("widgets and menus")
+		self.auto_saver = AutoSaver(self, max_delay_ms=self.auto_save_interval_ms)
+		self.auto_saver.writer.saved.connect(self._on_auto_saved)
+
+		# files of the loaded tabs are watched, each tab keeps the (mtime, size)
+		# of the version we last read or wrote
+		self.file_watcher = FileWatcher(self)
+		self.file_watcher.files_changed.connect(self._on_files_changed)
+		self._reload_prompt_open = False
+
+		self.new_file()
 		self._apply_light_theme()
-		self._start_auto_save()
+		startup_profile.mark("first document")
+
+	def showEvent(self, event):
+		super().showEvent(event)
+		if not self._started:
+			self._started = True
+			# runs once the first frame is painted
+			QTimer.singleShot(0, self._finish_startup)
+
+	def _finish_startup(self):
+		startup_profile.mark("show and first paint")
+		from ui.file_explorer import FileExplorerQt
+		from features.quick_open import PathIndex
+		from features.hash_menu import create_hash_menu
+
+		# File explorer
+		explorer = FileExplorerQt(self, self.open_file_from_explorer)
+		explorer.set_theme(self.is_dark_mode)
+		self.centralWidget().layout().replaceWidget(self._explorer_slot, explorer)
+		self._explorer_slot.deleteLater()
+		self._explorer_slot = None
+		self.explorer_frame = explorer
+
+		# every file of the opened folder, for Quick Open
+		self.path_index = PathIndex(self)
+		explorer.watcher.directories_changed.connect(self.path_index.mark_stale)
+		explorer.watcher.directories_changed.connect(self._on_search_dirs_changed)
+
+		# Tools menu
+		create_hash_menu(self, self.tools_menu)
+
+		# the font list is read on a worker, so Change Font opens at once
+		from features.font_catalog import font_catalog
+		font_catalog().load()
+		startup_profile.mark("explorer and tools")
+
+		self._restore_session()
+		startup_profile.mark("session restore")
+		startup_profile.report()
+
+	# the rest of the window works on the current tab through these
+	@property
+	def file_path(self):
+		return self.documents.current.file_path
+
+	@file_path.setter
+	def file_path(self, file_path):
+		doc = self.documents.current
+		doc.file_path = file_path
+		self._update_tab(doc)
+
+	@property
+	def file_encoding(self):
+		return self.documents.current.encoding
+
+	@file_encoding.setter
+	def file_encoding(self, encoding):
+		self.documents.current.encoding = encoding
+
+	@property
+	def large_file_view(self):
+		doc = self.documents.current
+		return doc.large_file_view if doc is not None else None
+
+	@property
+	def syntax_highlighter(self):
+		return self.documents.current.highlighter
+
+	@property
+	def text_stats(self):
+		return self.documents.current.stats
+
+	@property
+	def journal(self):
+		return self.documents.current.journal
 
 	def _create_widgets(self):
 		central = QWidget()
@@ -50,15 +180,37 @@ class PyPadQt(QMainWindow):
 		layout = QHBoxLayout()
 		central.setLayout(layout)
 
-		# File explorer
-		self.explorer_frame = FileExplorerQt(self, self.open_file_from_explorer)
-		layout.addWidget(self.explorer_frame, 1)
+		# holds the file explorer's place until _finish_startup() builds it
+		self._explorer_slot = QWidget()
+		layout.addWidget(self._explorer_slot, 1)
+
+		# Tab bar above the text editor
+		editor_column = QVBoxLayout()
+		editor_column.setContentsMargins(0, 0, 0, 0)
+		editor_column.setSpacing(0)
+		self.tab_bar = QTabBar()
+		self.tab_bar.setTabsClosable(True)
+		self.tab_bar.setMovable(True)
+		self.tab_bar.setExpanding(False)
+		self.tab_bar.setDocumentMode(True)
+		self.tab_bar.currentChanged.connect(self._on_tab_changed)
+		self.tab_bar.tabCloseRequested.connect(self.close_tab)
+		self.tab_bar.tabMoved.connect(self.documents.move)
+		editor_column.addWidget(self.tab_bar)
+		self.editor_layout = QVBoxLayout()
+		editor_column.addLayout(self.editor_layout)
+		layout.addLayout(editor_column, 3)
 
 		# Text editor
 		self.current_font = QFont("Consolas", 12)
 		self.text_area.setFont(self.current_font)
-		self.text_area.textChanged.connect(self._update_status_bar)
-		layout.addWidget(self.text_area, 3)
+		# counts arrive with every edit, the status bar repaints at most every 100 ms
+		self._status_timer = QTimer(self)
+		self._status_timer.setSingleShot(True)
+		self._status_timer.setInterval(100)
+		self._status_timer.timeout.connect(self._update_status_bar)
+		self.text_area.cursorPositionChanged.connect(self._update_status_bar)
+		self.editor_layout.addWidget(self.text_area)
 
 	def _create_menu(self):
 		menu_bar = self.menuBar()
@@ -73,6 +225,10 @@ class PyPadQt(QMainWindow):
 		open_action.triggered.connect(self.open_file)
 		file_menu.addAction(open_action)
 
+		quick_open_action = QAction("Quick Open...", self)
+		quick_open_action.triggered.connect(self.show_quick_open)
+		file_menu.addAction(quick_open_action)
+
 		save_action = QAction("Save", self)
 		save_action.triggered.connect(self.save_file)
 		file_menu.addAction(save_action)
@@ -81,6 +237,10 @@ class PyPadQt(QMainWindow):
 		save_as_action.triggered.connect(self.save_as_file)
 		file_menu.addAction(save_as_action)
 
+		close_tab_action = QAction("Close Tab", self)
+		close_tab_action.triggered.connect(self.close_current_tab)
+		file_menu.addAction(close_tab_action)
+
 		file_menu.addSeparator()
 
 		exit_action = QAction("Exit", self)
@@ -111,6 +271,10 @@ class PyPadQt(QMainWindow):
 		find_action.triggered.connect(self.show_find_dialog)
 		edit_menu.addAction(find_action)
 
+		find_in_files_action = QAction("Find in Files...", self)
+		find_in_files_action.triggered.connect(self.show_find_in_files)
+		edit_menu.addAction(find_in_files_action)
+
 		datetime_action = QAction("Date and Time", self)
 		datetime_action.triggered.connect(self.insert_datetime)
 		edit_menu.addAction(datetime_action)
@@ -125,8 +289,8 @@ class PyPadQt(QMainWindow):
 		font_action.triggered.connect(self.change_font)
 		view_menu.addAction(font_action)
 
-		# Tools menu
-		create_hash_menu(self)
+		# Tools menu, filled by _finish_startup()
+		self.tools_menu = menu_bar.addMenu("Tools")
 
 		# Options menu
 		options_menu = menu_bar.addMenu("Options")
@@ -134,19 +298,47 @@ class PyPadQt(QMainWindow):
 		self.auto_save_action.triggered.connect(self.toggle_auto_save)
 		options_menu.addAction(self.auto_save_action)
 
+		self.search_index_action = QAction("Index Folder for Fast Search", self, checkable=True)
+		self.search_index_action.triggered.connect(self.toggle_search_index)
+		options_menu.addAction(self.search_index_action)
+
 	def _create_status_bar(self):
 		self.status_bar = self.statusBar()
+
+		self.load_progress = QProgressBar()
+		self.load_progress.setMaximumWidth(160)
+		self.load_progress.setTextVisible(False)
+		self.load_progress.hide()
+		self.status_bar.addPermanentWidget(self.load_progress)
+
+		self.load_cancel_btn = QPushButton("Cancel")
+		self.load_cancel_btn.clicked.connect(self.cancel_file_load)
+		self.load_cancel_btn.hide()
+		self.status_bar.addPermanentWidget(self.load_cancel_btn)
+
 		self._update_status_bar()
 
 	def _update_status_bar(self):
+		if self.documents.current is None:
+			return
+		if self.large_file_view is not None:
+			mapped_file = self.large_file_view.mapped_file
+			self._update_large_file_status(mapped_file.indexed_lines, mapped_file.complete)
+			return
+		if self._load_thread is not None:
+			self.status_bar.showMessage(f"Loading {os.path.basename(self._load_thread.file_path)}...")
+			return
 		cursor = self.text_area.textCursor()
 		line = cursor.blockNumber() + 1
 		col = cursor.columnNumber() + 1
-		text = self.text_area.toPlainText()
-		words = len(text.split())
-		chars = len(text)
+		words = self.text_stats.words
+		chars = self.text_stats.chars
 		self.status_bar.showMessage(f"Ln {line}, Col {col} | Words: {words} | Chars: {chars}")
 
+	def _schedule_status_update(self):
+		if not self._status_timer.isActive():
+			self._status_timer.start()
+
 	def insert_datetime(self):
 		now = QDateTime.currentDateTime().toString("HH:mm dd/MM/yy")
 		self.text_area.insertPlainText(now)
@@ -158,68 +350,512 @@ class PyPadQt(QMainWindow):
 		folder_path = QFileDialog.getExistingDirectory(self, "Select Folder")
 		if folder_path:
 			self.explorer_frame.load_directory(folder_path)
+			self.path_index.set_root(folder_path)
+			self.search_index = None
+			self.search_index_changes.clear()
+			self.refresh_search_index()
 
 	def new_file(self):
-		self.text_area.clear()
-		self.file_path = None
-		self.setWindowTitle("PyPad - Untitled")
-		self._update_status_bar()
+		self._set_current(self._add_tab(Document()))
 
 	def open_file(self):
-		file_path, _ = QFileDialog.getOpenFileName(self, "Open File", "", "All Files (*.*)")
-		if file_path:
-			self.load_file_content(file_path)
+		file_paths, _ = QFileDialog.getOpenFileNames(self, "Open File", "", "All Files (*.*)")
+		if file_paths:
+			self.open_files(file_paths)
+
+	def open_files(self, file_paths, current=0):
+		# tabs opened together are only read from disk once they are shown
+		if not file_paths:
+			return
+		blank = self.documents.current
+		if blank is not None and not blank.is_blank():
+			blank = None
+		docs = []
+		for file_path in file_paths:
+			doc = self.documents.find(file_path)
+			if doc is None:
+				doc = self._add_tab(Document(file_path))
+			docs.append(doc)
+		self._set_current(docs[min(current, len(docs) - 1)])
+		if blank is not None and blank is not self.documents.current and blank in self.documents:
+			self.close_tab(self.documents.index(blank))
 
 	def open_file_from_explorer(self, file_path):
 		if os.path.isfile(file_path):
 			self.load_file_content(file_path)
 
 	def load_file_content(self, file_path):
+		# switches to the file's tab, or opens it in a new one
+		doc = self.documents.find(file_path)
+		if doc is None:
+			current = self.documents.current
+			if current is not None and current.is_blank():
+				# an empty Untitled tab is replaced rather than kept around
+				current.file_path = file_path
+				self._update_tab(current)
+				self._read_file()
+				return
+			doc = self._add_tab(Document(file_path))
+		self._set_current(doc)
+
+	def _add_tab(self, doc):
+		index = self.documents.add(doc)
+		self.tab_bar.insertTab(index, doc.title)
+		self._update_tab(doc)
+		return doc
+
+	def _update_tab(self, doc):
+		index = self.documents.index(doc)
+		self.tab_bar.setTabText(index, ("*" if doc.is_modified() else "") + doc.title)
+		self.tab_bar.setTabToolTip(index, doc.file_path or "")
+
+	def _set_current(self, doc):
+		index = self.documents.index(doc)
+		if self.tab_bar.currentIndex() != index:
+			self.tab_bar.setCurrentIndex(index)
+		else:
+			self._on_tab_changed(index)
+
+	def _on_tab_changed(self, index):
+		if not 0 <= index < len(self.documents):
+			return
+		doc = self.documents[index]
+		previous = self.documents.current
+		if doc is previous:
+			return
+		if previous is not None:
+			self._leave_document(previous)
+		self.documents.touch(doc)
+		self._show_document(doc)
+		self._evict_documents()
+
+	def _leave_document(self, doc):
+		# a pending auto-save still belongs to this tab
+		self.auto_saver.save_now()
+		self._pending_goto = None
+		if doc is self._load_doc:
+			# a half loaded buffer is dropped, showing the tab again starts over
+			self._cancel_load()
+			self._unload_document(doc)
+		elif doc.large_file_view is not None:
+			doc.large_file_view.hide()
+		elif doc.document is not None:
+			cursor = self.text_area.textCursor()
+			doc.cursor = (cursor.position(), cursor.anchor())
+			doc.scroll = (self.text_area.horizontalScrollBar().value(), self.text_area.verticalScrollBar().value())
+
+	def _show_document(self, doc):
+		if doc.large_file_view is not None:
+			self.text_area.setDocument(self._empty_document)
+			self.text_area.hide()
+			doc.large_file_view.show()
+		elif doc.document is not None:
+			self.text_area.setDocument(doc.document)
+			self.text_area.show()
+			self._restore_view(doc)
+		else:
+			self._create_document(doc)
+			if doc.file_path:
+				self._read_file()
+		self.auto_saver.document_switched()
+		if self.find_dialog is not None:
+			self.find_dialog.document_switched()
+		self._update_title()
+		self._update_status_bar()
+
+	def _restore_view(self, doc):
+		end = doc.document.characterCount() - 1
+		cursor = QTextCursor(doc.document)
+		cursor.setPosition(min(doc.cursor[1], end))
+		cursor.setPosition(min(doc.cursor[0], end), QTextCursor.KeepAnchor)
+		self.text_area.setTextCursor(cursor)
+		self.text_area.horizontalScrollBar().setValue(doc.scroll[0])
+		self.text_area.verticalScrollBar().setValue(doc.scroll[1])
+
+	def _create_document(self, doc):
+		# the buffer, highlighter, word counts and recovery journal of a tab
+		document = self._new_text_document()
+		doc.document = document
+		doc.highlighter = QtSyntaxHighlighter(document)
+		doc.highlighter.set_theme(self.is_dark_mode)
+		doc.stats = DocumentStats(document, document)
+		doc.stats.changed.connect(lambda: self._on_stats_changed(doc))
+		doc.journal = BufferJournal(document, parent=document)
+		doc.journal.reset()
+		document.modificationChanged.connect(lambda modified: self._on_modification_changed(doc, modified))
+		if doc is self.documents.current:
+			self.text_area.setDocument(document)
+			self.text_area.show()
+
+	def _new_text_document(self):
+		# CodeEditor only shows documents with a plain text layout
+		document = QTextDocument(self)
+		document.setDocumentLayout(QPlainTextDocumentLayout(document))
+		document.setDefaultFont(self.current_font)
+		return document
+
+	def _release_document(self, doc):
+		if doc.document is None:
+			return
+		if self.text_area.document() is doc.document:
+			self.text_area.setDocument(self._empty_document)
+		doc.highlighter.shutdown()
+		doc.journal.discard()
+		doc.document.deleteLater()
+		doc.document = doc.highlighter = doc.stats = doc.journal = None
+
+	def _release_large_view(self, doc):
+		view = doc.large_file_view
+		if view is None:
+			return
+		self.editor_layout.removeWidget(view)
+		view.close_file()
+		view.deleteLater()
+		doc.large_file_view = None
+
+	def _unload_document(self, doc):
+		# the tab stays, its file is read again when it is shown
+		self._release_large_view(doc)
+		self._release_document(doc)
+		self._unwatch(doc)
+		if doc in self.documents:
+			self._update_tab(doc)
+
+	def _evict_documents(self):
+		for doc in self.documents.eviction_candidates(lambda d: d is not self._load_doc):
+			self._unload_document(doc)
+
+	def close_current_tab(self):
+		if self.documents.current is not None:
+			self.close_tab(self.documents.index(self.documents.current))
+
+	def close_tab(self, index):
+		doc = self.documents[index]
+		if doc is self._load_doc:
+			self._cancel_load()
+		if doc.is_modified():
+			self._set_current(doc)
+			from PyQt5.QtWidgets import QMessageBox
+			answer = QMessageBox.question(
+				self, "Close Tab", f"Save changes to {doc.title}?",
+				QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel, QMessageBox.Save)
+			if answer == QMessageBox.Cancel or (answer == QMessageBox.Save and not self.save_file()):
+				return False
+		if doc is self.documents.current:
+			self._pending_goto = None
+		self._unload_document(doc)
+		self.documents.remove(doc)
+		self.tab_bar.removeTab(index)
+		if not len(self.documents):
+			self.new_file()
+		return True
+
+	def next_tab(self, step=1):
+		if len(self.documents) > 1:
+			self.tab_bar.setCurrentIndex((self.tab_bar.currentIndex() + step) % len(self.documents))
+
+	def _update_title(self):
+		doc = self.documents.current
+		state = ""
+		if doc is self._load_doc:
+			state = " (loading...)"
+		elif doc.large_file_view is not None:
+			state = " [read-only]"
+		elif doc.recovered:
+			state = " (recovered)"
+		self.setWindowTitle(f"PyPad - {doc.file_path or 'Untitled'}{state}")
+
+	def _on_stats_changed(self, doc):
+		if doc is self.documents.current:
+			self._schedule_status_update()
+
+	def _read_file(self):
+		# (re)reads the current tab's file from disk
+		doc = self.documents.current
+		file_path = doc.file_path
 		try:
-			with open(file_path, "r", encoding="utf-8") as f:
-				content = f.read()
-			self.text_area.setPlainText(content)
-			self.file_path = file_path
-			self.setWindowTitle(f"PyPad - {file_path}")
+			size = os.path.getsize(file_path)
+			if size >= self.large_file_threshold:
+				self._cancel_load()
+				self._open_large_file(file_path)
+				return
 
-			if hasattr(self, "syntax_highlighter") and self.syntax_highlighter is not None:
-				self.syntax_highlighter.set_file(file_path)
+			content = None
+			if size < self.async_load_threshold:
+				content, encoding = read_text_file(file_path)
 
-			self._update_status_bar()
+			self._cancel_load()
+			self._close_large_file()
+			if doc.document is None:
+				self._create_document(doc)
+			# skip highlighting while the text is replaced, set_file() then
+			# tokenizes large documents in the background, viewport first
+			self.syntax_highlighter.suspend()
+			if content is None:
+				self._start_async_load(file_path)
+				return
+
+			# the journal restarts from the file in _finish_load(), logging
+			# the replaced text would only copy the whole file on this thread
+			self.journal.enabled = False
+			self.text_area.setPlainText(content)
+			self.journal.enabled = True
+			self.file_encoding = encoding
+			self._finish_load(file_path)
 		except Exception as e:
 			from PyQt5.QtWidgets import QMessageBox
 			QMessageBox.critical(self, "Error", f"Could not open file:\n{e}")
+			self._drop_unreadable(doc)
+
+	def _drop_unreadable(self, doc):
+		# a tab whose file could not be read holds nothing worth keeping
+		if doc in self.documents and not doc.is_modified():
+			self.close_tab(self.documents.index(doc))
+
+	def _finish_load(self, file_path):
+		doc = self.documents.current
+		self.file_path = file_path
+		self._watch_file(file_path)
+		self._update_title()
+		self.journal.reset(file_path, self.file_encoding)
+		self.syntax_highlighter.set_file(file_path)
+
+		if self._pending_goto is not None:
+			self.go_to_line(*self._pending_goto)
+		else:
+			self._restore_view(doc)
+		self._update_status_bar()
+		self._evict_documents()
+
+	def _start_async_load(self, file_path):
+		self._load_job += 1
+		thread = FileLoadThread(self._load_job, file_path)
+		thread.encoding_detected.connect(self._on_encoding_detected)
+		thread.chunk_loaded.connect(self._on_chunk_loaded)
+		thread.load_finished.connect(self._on_load_finished)
+		thread.load_failed.connect(self._on_load_failed)
+		thread.finished.connect(lambda: self._load_threads.remove(thread))
+		self._load_threads.append(thread)
+		self._load_thread = thread
+		self._load_doc = self.documents.current
+
+		# appended chunks must not pile up in the undo stack or the journal
+		self.text_area.document().setUndoRedoEnabled(False)
+		self.journal.enabled = False
+		self.text_area.clear()
+		self.text_area.setReadOnly(True)
+		self._update_title()
+		self.load_progress.setRange(0, max(1, thread.total_bytes))
+		self.load_progress.setValue(0)
+		self.load_progress.show()
+		self.load_cancel_btn.show()
+		self._update_status_bar()
+		thread.start()
+
+	def _on_encoding_detected(self, job_id, encoding):
+		if job_id == self._load_job:
+			self.file_encoding = encoding
+
+	def _on_chunk_loaded(self, job_id, text, bytes_read):
+		if job_id != self._load_job:
+			return
+		self._load_queue.append((text, bytes_read))
+		if not self._load_timer.isActive():
+			self._load_timer.start(0)
+
+	def _on_load_finished(self, job_id):
+		if job_id != self._load_job:
+			return
+		self._load_done = True
+		if not self._load_timer.isActive():
+			self._load_timer.start(0)
+
+	def _append_loaded_chunks(self):
+		# one batch per event loop turn, so input and painting keep flowing
+		if self._load_queue:
+			texts = []
+			size = 0
+			while self._load_queue and size < self.load_batch_chars:
+				text, bytes_read = self._load_queue.popleft()
+				texts.append(text)
+				size += len(text)
+			cursor = QTextCursor(self.text_area.document())
+			cursor.movePosition(QTextCursor.End)
+			cursor.insertText("".join(texts))
+			self.load_progress.setValue(bytes_read)
+
+		if self._load_queue:
+			self._load_timer.start(0)
+		elif self._load_done:
+			file_path = self._load_thread.file_path
+			self._end_load()
+			self._finish_load(file_path)
+
+	def _on_load_failed(self, job_id, message):
+		if job_id != self._load_job:
+			return
+		doc = self._load_doc
+		self._end_load()
+		from PyQt5.QtWidgets import QMessageBox
+		QMessageBox.critical(self, "Error", f"Could not open file:\n{message}")
+		self._drop_unreadable(doc)
+
+	def _end_load(self):
+		self._load_thread = None
+		self._load_doc = None
+		self._load_queue.clear()
+		self._load_done = False
+		self._load_timer.stop()
+		self.load_progress.hide()
+		self.load_cancel_btn.hide()
+		self.text_area.setReadOnly(False)
+		self.text_area.document().setUndoRedoEnabled(True)
+		self.journal.enabled = True
+		self.text_area.document().setModified(False)
+
+	def _cancel_load(self):
+		if self._load_thread is None:
+			return
+		self._load_thread.cancel()
+		self._load_job += 1
+		self._end_load()
+
+	def cancel_file_load(self):
+		# a partially loaded buffer must never be saved over the file
+		if self._load_thread is not None:
+			self.close_tab(self.documents.index(self._load_doc))
+
+	def _open_large_file(self, file_path):
+		from ui.large_file_view import LargeFileView
+		view = LargeFileView(file_path, self)
+		doc = self.documents.current
+		self._close_large_file()
+		self._release_document(doc)
+		self.text_area.hide()
+
+		view.set_theme(self.is_dark_mode)
+		view.line_count_changed.connect(lambda lines, complete: self._on_large_file_lines(view, lines, complete))
+		self.editor_layout.addWidget(view, 3)
+		doc.large_file_view = view
+		self.file_path = file_path
+		self.file_encoding = view.mapped_file.encoding
+		self._watch_file(file_path)
+		self._update_title()
+		self._update_large_file_status(view.mapped_file.indexed_lines, view.mapped_file.complete)
+
+	def _close_large_file(self):
+		if self.large_file_view is None:
+			return
+		self._release_large_view(self.documents.current)
+		self.text_area.show()
+
+	def _on_large_file_lines(self, view, lines, complete):
+		if view is self.large_file_view:
+			self._update_large_file_status(lines, complete)
+
+	def _update_large_file_status(self, lines, complete):
+		size_mb = self.large_file_view.mapped_file.size / (1024 * 1024)
+		state = "" if complete else " (indexing...)"
+		self.status_bar.showMessage(f"Read-only | Lines: {lines}{state} | Size: {size_mb:.1f} MB")
+
+	def buffer_is_partial(self):
+		# the buffer is only a window / a partial copy of the file, never write it back
+		return self.large_file_view is not None or self._load_thread is not None
 
 	def save_file(self):
+		if self.buffer_is_partial():
+			return False
 		if self.file_path:
-			try:
-				with open(self.file_path, "w", encoding="utf-8") as f:
-					f.write(self.text_area.toPlainText())
-				return True
-			except Exception as e:
-				from PyQt5.QtWidgets import QMessageBox
-				QMessageBox.critical(self, "Error", f"Failed to save file: {e}")
-				return False
+			return self._save_to(self.file_path)
 		else:
 			return self.save_as_file()
+
+	def _save_to(self, file_path):
+		try:
+			writer = self.auto_saver.writer
+			writer.discard(file_path)
+			with writer.write_lock:
+				atomic_write(file_path, self.text_area.toPlainText(), self.file_encoding)
+			# Save As renames the tab only once the file is written
+			if file_path != self.file_path:
+				self.file_path = file_path
+			self.text_area.document().setModified(False)
+			self.auto_saver.mark_saved()
+			self._watch_file(self.file_path)
+			self._on_search_dirs_changed([os.path.dirname(self.file_path)])
+			if self.documents.current.recovered:
+				self.documents.current.recovered = False
+				self._update_title()
+			return True
+		except Exception as e:
+			from PyQt5.QtWidgets import QMessageBox
+			QMessageBox.critical(self, "Error", f"Failed to save file: {e}")
+			return False
 			
 	def save_as_file(self):
+		if self.buffer_is_partial():
+			return False
 		file_path, _ = QFileDialog.getSaveFileName(self, "Save File As", "", "All Files (*.*)")
 		if file_path:
-			self.file_path = file_path
-			if self.save_file():
-				self.setWindowTitle(f"PyPad - {file_path}")
+			other = self.documents.find(file_path)
+			if other is not None and other is not self.documents.current:
+				# one tab per file: writing over it here would leave that tab stale
+				self._set_current(other)
+				self.status_bar.showMessage(f"{os.path.basename(file_path)} is already open", 5000)
+				return False
+			if self._save_to(file_path):
+				self._update_title()
 				# update highlighter to use new file extension / lexer
-				if hasattr(self, "syntax_highlighter") and self.syntax_highlighter is not None:
-					self.syntax_highlighter.set_file(file_path)
+				self.syntax_highlighter.set_file(file_path)
 				return True
 		return False
 
 	def show_find_dialog(self):
 		if self.find_dialog is None:
+			from dialogs.find_and_replace import FindReplaceDialog
 			self.find_dialog = FindReplaceDialog(self)
 		self.find_dialog.show()
 
+	def show_quick_open(self):
+		if self.quick_open_dialog is None:
+			from dialogs.quick_open import QuickOpenDialog
+			self.quick_open_dialog = QuickOpenDialog(self, self.path_index)
+		self.quick_open_dialog.popup()
+
+	def show_find_in_files(self):
+		if self.find_in_files_dock is None:
+			from ui.find_in_files import FindInFilesPanel
+			self.find_in_files_panel = FindInFilesPanel(self)
+			self.find_in_files_panel.set_theme(self.is_dark_mode)
+			self.find_in_files_dock = QDockWidget("Find in Files", self)
+			self.find_in_files_dock.setWidget(self.find_in_files_panel)
+			self.addDockWidget(Qt.BottomDockWidgetArea, self.find_in_files_dock)
+		self.find_in_files_dock.show()
+		self.find_in_files_panel.find_entry.setFocus()
+		self.find_in_files_panel.find_entry.selectAll()
+
+	def go_to_line(self, line, column=0, length=0):
+		# line from 1, column in characters; waits for a file still loading
+		if self._load_thread is not None:
+			self._pending_goto = (line, column, length)
+			return
+		self._pending_goto = None
+		if self.large_file_view is not None:
+			self.large_file_view.scroll_bar.setValue(line - 1)
+			return
+		block = self.text_area.document().findBlockByNumber(line - 1)
+		if not block.isValid():
+			return
+		text = block.text()
+		positions = PositionMap(text)
+		column = min(column, len(text))
+		cursor = QTextCursor(block)
+		cursor.setPosition(block.position() + positions.to_doc(column))
+		cursor.setPosition(block.position() + positions.to_doc(min(column + length, len(text))), QTextCursor.KeepAnchor)
+		self.text_area.setTextCursor(cursor)
+		self.text_area.ensureCursorVisible()
+		self.text_area.setFocus()
+
 	def toggle_dark_mode(self):
 		if self.is_dark_mode:
 			self._apply_light_theme()
@@ -228,19 +864,30 @@ class PyPadQt(QMainWindow):
 
 		self.is_dark_mode = not self.is_dark_mode
 
-		# just change theme
-		self.syntax_highlighter.set_theme(self.is_dark_mode)
-
-		# If file is opening --> re-highlight it
-		if self.file_path:
-			self.syntax_highlighter.set_file(self.file_path)
+		# just change theme, cached tokens are re-used so nothing is re-lexed
+		for doc in self.documents:
+			if doc.highlighter is not None:
+				doc.highlighter.set_theme(self.is_dark_mode)
 
-		update_hash_menu_theme(self)
+		# an empty Tools menu is styled when _finish_startup() fills it
+		if self.tools_menu.actions():
+			from features.hash_menu import update_hash_menu_theme
+			update_hash_menu_theme(self)
 
 	def _apply_dark_theme(self):
-		self.text_area.setStyleSheet("background-color:#1e1e1e; color:#d4d4d4")
+		self.text_area.set_theme(True)
+		for doc in self.documents:
+			if doc.large_file_view is not None:
+				doc.large_file_view.set_theme(True)
+		self.tab_bar.setStyleSheet("""
+			QTabBar::tab { background: #2d2d2d; color: #d4d4d4; padding: 4px 10px; }
+			QTabBar::tab:selected { background: #1e1e1e; color: white; }
+		""")
 		self.status_bar.setStyleSheet("background-color:#2d2d2d; color:white")
-		self.explorer_frame.set_theme(True)
+		if self.explorer_frame is not None:
+			self.explorer_frame.set_theme(True)
+		if self.find_in_files_dock is not None:
+			self.find_in_files_panel.set_theme(True)
 		self.centralWidget().setStyleSheet("background-color:#2d2d2d;")
 
 		# menu bar + menu items
@@ -266,9 +913,19 @@ class PyPadQt(QMainWindow):
 		""")
 
 	def _apply_light_theme(self):
-		self.text_area.setStyleSheet("background-color:white; color:black")
+		self.text_area.set_theme(False)
+		for doc in self.documents:
+			if doc.large_file_view is not None:
+				doc.large_file_view.set_theme(False)
+		self.tab_bar.setStyleSheet("""
+			QTabBar::tab { background: #e0e0e0; color: black; padding: 4px 10px; }
+			QTabBar::tab:selected { background: white; }
+		""")
 		self.status_bar.setStyleSheet("background-color:#f0f0f0; color:black")
-		self.explorer_frame.set_theme(False)
+		if self.explorer_frame is not None:
+			self.explorer_frame.set_theme(False)
+		if self.find_in_files_dock is not None:
+			self.find_in_files_panel.set_theme(False)
 		self.centralWidget().setStyleSheet("background-color:#f0f0f0;")
 
 		self.menuBar().setStyleSheet("""
@@ -298,26 +955,225 @@ class PyPadQt(QMainWindow):
 		self.auto_save_enabled = self.auto_save_action.isChecked()
 		if self.auto_save_enabled and not self.file_path:
 			self.save_as_file()
+		self.auto_saver.set_enabled(self.auto_save_enabled)
+
+	def toggle_search_index(self, checked):
+		self.search_index_enabled = checked
+		if checked:
+			self.refresh_search_index()
+		else:
+			self._cancel_index_build()
+			self.search_index = None
+			self.search_index_changes.clear()
 
-	def _start_auto_save(self):
-		if self.auto_save_enabled and self.file_path:
-			self.save_file()
-		QTimer.singleShot(self.auto_save_interval_ms, self._start_auto_save)
+	def refresh_search_index(self):
+		# loads the saved index and re-reads only files whose size/mtime changed
+		root = self.explorer_frame.root_path
+		if not self.search_index_enabled or not root:
+			return
+		if self._index_thread is not None:
+			if self._index_thread.root == root:
+				return
+			self._cancel_index_build()
+		from features.trigram_index import IndexBuildThread
+		thread = IndexBuildThread(root)
+		thread.changes_seen = self._search_index_change_count
+		thread.progress.connect(self._on_index_progress)
+		thread.index_ready.connect(self._on_index_ready)
+		thread.finished.connect(lambda: self._index_threads.remove(thread))
+		thread.finished.connect(lambda: self._on_index_thread_finished(thread))
+		self._index_threads.append(thread)
+		self._index_thread = thread
+		thread.start()
 
-	def change_font(self):
-		# Callback to apply when press "OK"
-		def apply_font(name, size, style):
-			weight = "bold" if "Bold" in style else "normal"
-			slant = "italic" if "Italic" in style else "roman"
+	def _cancel_index_build(self):
+		if self._index_thread is not None:
+			self._index_thread.cancel()
+			self._index_thread = None
 
-			font = QFont(name, size)
-			font.setWeight(QFont.Bold if weight=="bold" else QFont.Normal)
-			font.setItalic(slant=="italic")
+	def _on_index_progress(self, done, total):
+		if self.sender() is self._index_thread:
+			self.status_bar.showMessage(f"Indexing folder... {done}/{total} files", 2000)
 
-			self.text_area.setFont(font)
-			self.current_font = font
+	def _on_index_ready(self, index):
+		thread = self.sender()
+		if thread is self._index_thread and index.covers(self.explorer_frame.root_path):
+			self.search_index = index
+			# the build walked the tree after these changes
+			for path, change in list(self.search_index_changes.items()):
+				if change <= thread.changes_seen:
+					del self.search_index_changes[path]
+
+	def _on_index_thread_finished(self, thread):
+		if thread is self._index_thread:
+			self._index_thread = None
+
+	def _on_search_dirs_changed(self, paths):
+		# kept until an index build started after the change is ready
+		if not self.search_index_enabled:
+			return
+		self._search_index_change_count += 1
+		for path in paths:
+			self.search_index_changes[path] = self._search_index_change_count
+
+	def _watch_file(self, file_path):
+		# for the current tab; also called after every save, so our own
+		# writes never look like outside changes
+		doc = self.documents.current
+		self._unwatch(doc)
+		if file_path:
+			self.file_watcher.watch_file(file_path)
+			doc.watched_path = file_path
+			doc.disk_state = file_snapshot(file_path)
+
+	def _unwatch(self, doc):
+		path = doc.watched_path
+		doc.watched_path = None
+		doc.disk_state = None
+		if path and not any(other.watched_path == path for other in self.documents):
+			self.file_watcher.unwatch_file(path)
+
+	def _on_auto_saved(self, file_path, revision):
+		doc = self.documents.find(file_path)
+		if doc is not None and doc.watched_path:
+			doc.disk_state = file_snapshot(file_path)
+		self._on_search_dirs_changed([os.path.dirname(file_path)])
+
+	def _on_files_changed(self, paths):
+		if self._reload_prompt_open:
+			return
+		for path in paths:
+			doc = self.documents.find(path)
+			if doc is None or doc.watched_path is None:
+				continue
+			state = file_snapshot(path)
+			if state == doc.disk_state:
+				continue
+			doc.disk_state = state
+			name = os.path.basename(path)
+			if state is None:
+				self.status_bar.showMessage(f"{name} was deleted on disk", 5000)
+				continue
+
+			if doc.is_modified() or doc is self._load_doc:
+				from PyQt5.QtWidgets import QMessageBox
+				self._reload_prompt_open = True
+				answer = QMessageBox.question(
+					self, "File Changed",
+					f"{path} has changed on disk.\nReload it and lose your changes?",
+					QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+				self._reload_prompt_open = False
+				if answer != QMessageBox.Yes:
+					continue
+			if doc is self.documents.current:
+				self.reload_file()
+			else:
+				# background tabs are read again when they are shown
+				self._unload_document(doc)
+			self.status_bar.showMessage(f"{name} reloaded from disk", 3000)
+
+	def reload_file(self):
+		# keeps the caret on the same line and column
+		if not self.file_path:
+			return
+		cursor = self.text_area.textCursor()
+		line, column = cursor.blockNumber() + 1, cursor.positionInBlock()
+		if self.large_file_view is not None:
+			line, column = self.large_file_view.top_line + 1, 0
+		self._read_file()
+		self.go_to_line(line, column)
+
+	def _on_modification_changed(self, doc, modified):
+		self._update_tab(doc)
+		# back in sync with the file on disk, restart the journal from there
+		if not modified and doc.large_file_view is None and doc is not self._load_doc:
+			doc.journal.reset(doc.file_path, doc.encoding)
+
+	def _restore_session(self):
+		file_paths, current = load_session()
+		self.open_files(file_paths, current)
+		self._offer_recovery()
+
+	def _offer_recovery(self):
+		buffers = find_recoverable()
+		if not buffers:
+			return
+		names = ", ".join(os.path.basename(b["file_path"]) if b["file_path"] else "Untitled" for b in buffers[:5])
+		if len(buffers) > 5:
+			names += f" and {len(buffers) - 5} more"
+		from PyQt5.QtWidgets import QMessageBox
+		reply = QMessageBox.question(
+			self,
+			"Recover unsaved work",
+			f"PyPad found unsaved changes to {names} from a previous session.\nRestore them?",
+			QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+		)
+		if reply == QMessageBox.StandardButton.Yes:
+			for buffer in buffers:
+				self.restore_buffer(buffer)
+		for buffer in buffers:
+			discard_journal(buffer["journal_id"])
+
+	def restore_buffer(self, buffer):
+		# into the file's tab if it is open, without reading the file first
+		doc = self.documents.find(buffer["file_path"])
+		if doc is None:
+			doc = self.documents.current
+			if doc is None or not doc.is_blank():
+				doc = self._add_tab(Document())
+		if doc is self._load_doc:
+			self._cancel_load()
+		self._release_large_view(doc)
+		if doc.document is None:
+			self._create_document(doc)
+		doc.file_path = buffer["file_path"]
+		doc.encoding = buffer["encoding"]
+		doc.recovered = True
+		doc.highlighter.suspend()
+		doc.journal.enabled = False
+		doc.document.setPlainText(buffer["text"])
+		doc.journal.enabled = True
+		doc.highlighter.set_file(doc.file_path or "")
+		doc.journal.reset(doc.file_path, doc.encoding, from_disk=False)
+		doc.document.setModified(True)
+		self._set_current(doc)
+		self._show_document(doc)
+		self._watch_file(doc.file_path)
+
+	def closeEvent(self, event):
+		self.auto_saver.shutdown()
+		if self.find_in_files_dock is not None:
+			self.find_in_files_panel.cancel_search()
+		self._cancel_index_build()
+		from features.project_search import shutdown_search_pool
+		shutdown_search_pool()
+		# unsaved buffers keep their journal and are offered again next start
+		for doc in self.documents:
+			if doc.journal is None:
+				continue
+			if doc.is_modified():
+				doc.journal.close()
+			else:
+				doc.journal.discard()
+		file_paths = [doc.file_path for doc in self.documents if doc.file_path]
+		current = self.documents.current.file_path
+		save_session(file_paths, file_paths.index(current) if current in file_paths else 0)
+		super().closeEvent(event)
+
+	def change_font(self):
+		if self.font_dialog is None:
+			from dialogs.FontDialogWinStyle import FontDialogWinStyle
+			self.font_dialog = FontDialogWinStyle(self, self.current_font, self._apply_font)
+		else:
+			self.font_dialog.select_font(self.current_font)
+		self.font_dialog.show()
 
-		# Create dialog with current font and callback
-		dialog = FontDialogWinStyle(self, self.current_font, apply_font)
-		dialog.show()
+	def _apply_font(self, name, size, style):
+		from dialogs.FontDialogWinStyle import font_for
+		font = font_for(name, style, size)
+		self.text_area.setFont(font)
+		self.current_font = font
+		for doc in self.documents:
+			if doc.document is not None:
+				doc.document.setDefaultFont(font)
 
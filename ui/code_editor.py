@@ -0,0 +1,99 @@
+from PyQt5.QtWidgets import QPlainTextEdit, QWidget
+from PyQt5.QtCore import Qt, QEvent, QRect, QSize
+from PyQt5.QtGui import QColor, QPainter
+
+
+class LineNumberArea(QWidget):
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+
+    def sizeHint(self):
+        return QSize(self.editor.line_number_width(), 0)
+
+    def paintEvent(self, event):
+        self.editor.paint_line_numbers(event)
+
+
+class CodeEditor(QPlainTextEdit):
+    # Plain text editor of PyPadQt. QPlainTextEdit lays out block by block
+    # and only for what is on screen, so scrolling and editing cost the same
+    # for a 500k line file as for a small one. The gutter paints the numbers
+    # of the visible blocks only and is scrolled along with the text.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.line_numbers = LineNumberArea(self)
+        self._digits = 0
+        self._gutter_background = QColor("#f0f0f0")
+        self._gutter_foreground = QColor("#858585")
+
+        self.blockCountChanged.connect(self._update_gutter_width)
+        self.updateRequest.connect(self._update_gutter)
+        self._update_gutter_width()
+
+    def setDocument(self, document):
+        super().setDocument(document)
+        # blockCountChanged is not emitted for the swap itself
+        self._update_gutter_width()
+
+    def set_theme(self, dark_mode):
+        if dark_mode:
+            self.setStyleSheet("background-color:#1e1e1e; color:#d4d4d4")
+            self._gutter_background = QColor("#252526")
+            self._gutter_foreground = QColor("#858585")
+        else:
+            self.setStyleSheet("background-color:white; color:black")
+            self._gutter_background = QColor("#f0f0f0")
+            self._gutter_foreground = QColor("#858585")
+        self.line_numbers.update()
+
+    def line_number_width(self):
+        digits = max(3, len(str(self.blockCount())))
+        return 10 + self.fontMetrics().horizontalAdvance("9") * digits
+
+    def _update_gutter_width(self, *args):
+        # the margin only moves when the number of digits changes
+        digits = max(3, len(str(self.blockCount())))
+        if digits != self._digits:
+            self._digits = digits
+            self.setViewportMargins(self.line_number_width(), 0, 0, 0)
+            self._place_gutter()
+
+    def _place_gutter(self):
+        rect = self.contentsRect()
+        self.line_numbers.setGeometry(QRect(rect.left(), rect.top(), self.line_number_width(), rect.height()))
+
+    def _update_gutter(self, rect, dy):
+        if dy:
+            self.line_numbers.scroll(0, dy)
+        else:
+            self.line_numbers.update(0, rect.y(), self.line_numbers.width(), rect.height())
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.FontChange:
+            self._digits = 0
+            self._update_gutter_width()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._place_gutter()
+
+    def paint_line_numbers(self, event):
+        painter = QPainter(self.line_numbers)
+        painter.fillRect(event.rect(), self._gutter_background)
+        painter.setPen(self._gutter_foreground)
+        painter.setFont(self.font())
+
+        width = self.line_numbers.width() - 5
+        height = self.fontMetrics().height()
+        bottom_edge = event.rect().bottom()
+        block = self.firstVisibleBlock()
+        offset = self.contentOffset()
+        while block.isValid():
+            geometry = self.blockBoundingGeometry(block).translated(offset)
+            if geometry.top() > bottom_edge:
+                break
+            if block.isVisible() and geometry.bottom() >= event.rect().top():
+                painter.drawText(0, int(geometry.top()), width, height, Qt.AlignRight, str(block.blockNumber() + 1))
+            block = block.next()
@@ -1,95 +1,431 @@
 from PyQt5.QtWidgets import (
-    QTreeWidget, QTreeWidgetItem, QVBoxLayout, QWidget
+    QTreeView, QVBoxLayout, QWidget, QFileIconProvider
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import (
+    Qt, QObject, QRunnable, QThreadPool, QAbstractItemModel, QModelIndex,
+    QPersistentModelIndex, pyqtSignal
+)
+from bisect import bisect_left
+from itertools import groupby
 import os
 
-class LoadDirThread(QThread):
-    update_items = pyqtSignal(list)
+from features.file_watcher import FileWatcher
+
+UNLISTED, LISTING, LISTED = range(3)
+
+
+def _sort_key(name, is_dir):
+    # directories first, then case-insensitive, same order LoadDirTask lists in
+    return (not is_dir, name.lower(), name)
+
+
+def _runs(rows):
+    # [3, 4, 5, 9] -> [[3, 4, 5], [9]]
+    runs = []
+    for row in rows:
+        if runs and runs[-1][-1] == row - 1:
+            runs[-1].append(row)
+        else:
+            runs.append([row])
+    return runs
+
+
+class LoadDirSignals(QObject):
+    # (request id, batch of (name, is dir), listing finished)
+    update_items = pyqtSignal(int, list, bool)
 
-    def __init__(self, parent_path):
+
+class LoadDirTask(QRunnable):
+    BATCH_SIZE = 1000
+
+    def __init__(self, request, parent_path, signals):
         super().__init__()
+        self.request = request
         self.parent_path = parent_path
+        # owned by the explorer, a per-task QObject could be gone before
+        # its queued batches are delivered
+        self.signals = signals
 
     def run(self):
+        entries = []
         try:
-            items = sorted(
-                os.listdir(self.parent_path),
-                key=lambda x: (not os.path.isdir(os.path.join(self.parent_path, x)), x.lower())
-            )
-            nodes = []
-            for name in items:
-                full_path = os.path.join(self.parent_path, name)
-                is_dir = os.path.isdir(full_path)
-                display_name = f"📁 {name}" if is_dir else f"📄 {name}"
-                nodes.append((display_name, full_path, is_dir))
-            self.update_items.emit(nodes)
+            # DirEntry.is_dir() comes from the directory listing itself, no stat per entry
+            with os.scandir(self.parent_path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    entries.append((not is_dir, entry.name.lower(), entry.name))
+        except FileNotFoundError:
+            pass  # removed while the listing was queued, the parent's refresh drops it
         except Exception as e:
             print("Error loading directory:", e)
+        entries.sort()
+
+        nodes = [(name, not is_file) for is_file, _, name in entries]
+        for start in range(0, len(nodes), self.BATCH_SIZE):
+            self.signals.update_items.emit(self.request, nodes[start:start + self.BATCH_SIZE], False)
+        self.signals.update_items.emit(self.request, [], True)
+
+
+class FileNode:
+    # a node only exists once its row has been handed to the view; listed
+    # entries wait in `pending` as plain (name, is dir) tuples
+    __slots__ = ("parent", "name", "is_dir", "row", "children", "pending", "state")
+
+    def __init__(self, parent, name, is_dir, row):
+        self.parent = parent
+        self.name = name
+        self.is_dir = is_dir
+        self.row = row
+        self.children = []
+        self.pending = []
+        self.state = UNLISTED
+
+    def path(self):
+        parts = []
+        node = self
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return os.path.join(node.name, *reversed(parts)) if parts else node.name
+
+
+class FileTreeModel(QAbstractItemModel):
+    # Lazy model of one folder. Directories are listed on a thread pool the
+    # first time the view asks for their rows (canFetchMore/fetchMore), and
+    # rows are handed out PAGE_SIZE at a time as the view scrolls. Collapsing
+    # a big directory releases its rows again.
+    directory_listed = pyqtSignal(str)
+    directory_released = pyqtSignal(str)
+
+    PAGE_SIZE = 500
+    RELEASE_ROWS = 2000
+    # a refresh with more separate insert/remove runs than this re-lays out
+    # the directory in one go instead of one rows signal per run
+    MAX_ROW_RUNS = 16
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._root = FileNode(None, "", True, 0)
+        self._root.state = LISTED
+        self._requests = {}
+        self._refreshes = {}
+        self._next_request = 0
+        # listing runs on a small shared pool instead of one QThread per expand
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(4)
+        self._signals = LoadDirSignals(self)
+        self._signals.update_items.connect(self._on_items)
+
+        icons = QFileIconProvider()
+        self._dir_icon = icons.icon(QFileIconProvider.Folder)
+        self._file_icon = icons.icon(QFileIconProvider.File)
+
+    def set_root_path(self, folder_path):
+        self.beginResetModel()
+        self._requests.clear()
+        self._refreshes.clear()
+        self._root = FileNode(None, "", True, 0)
+        self._root.state = LISTED
+        top = FileNode(self._root, folder_path, True, 0)
+        self._root.children.append(top)
+        self.endResetModel()
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self._root
+
+    def path(self, index):
+        return self.node(index).path()
+
+    def is_dir(self, index):
+        return self.node(index).is_dir
+
+    # --- QAbstractItemModel ---
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node(parent)
+        if column != 0 or not 0 <= row < len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, 0, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self._root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        return node.is_dir and (node.state != LISTED or bool(node.children) or bool(node.pending))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            if node.parent is self._root:
+                return os.path.basename(os.path.normpath(node.name)) or node.name
+            return node.name
+        if role == Qt.DecorationRole:
+            return self._dir_icon if node.is_dir else self._file_icon
+        if role == Qt.ToolTipRole:
+            return node.path()
+        return None
+
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        return node.is_dir and (node.state == UNLISTED or bool(node.pending))
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        if node.state == UNLISTED:
+            node.state = LISTING
+            self._next_request += 1
+            self._requests[self._next_request] = node
+            self._pool.start(LoadDirTask(self._next_request, node.path(), self._signals))
+            return
+        self._insert_page(parent, node)
+
+    # --- listing ---
+
+    def _index_of(self, node):
+        if node is self._root:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def _insert_page(self, parent, node):
+        if not node.pending:
+            return
+        page = node.pending[:self.PAGE_SIZE]
+        del node.pending[:self.PAGE_SIZE]
+        first = len(node.children)
+        self.beginInsertRows(parent, first, first + len(page) - 1)
+        node.children.extend(FileNode(node, name, is_dir, first + i) for i, (name, is_dir) in enumerate(page))
+        self.endInsertRows()
+
+    def _on_items(self, request, nodes, done):
+        if request in self._refreshes:
+            node, entries = self._refreshes[request]
+            entries.extend(nodes)
+            if done:
+                del self._refreshes[request]
+                if node.state == LISTED and self._is_attached(node):
+                    self._apply_listing(node, entries)
+            return
+        node = self._requests.get(request)
+        if node is None:
+            return
+        had_rows = bool(node.children)
+        node.pending.extend(nodes)
+        if done:
+            del self._requests[request]
+            node.state = LISTED
+            self.directory_listed.emit(node.path())
+        parent = self._index_of(node)
+        # the first page goes in right away, the rest when the view scrolls there
+        if not had_rows and node.pending:
+            self._insert_page(parent, node)
+        elif done and not node.children:
+            # empty directory, let the view drop the expand arrow
+            self.dataChanged.emit(parent, parent)
+
+    def release(self, index):
+        # forget the rows of a collapsed directory, it is listed again on the next expand
+        node = self.node(index)
+        if len(node.children) + len(node.pending) < self.RELEASE_ROWS:
+            return
+        for request, pending_node in list(self._requests.items()):
+            if pending_node is node:
+                del self._requests[request]
+        if node.children:
+            self.beginRemoveRows(index, 0, len(node.children) - 1)
+            for child in node.children:
+                self._release_subtree(child)
+            node.children = []
+            self.endRemoveRows()
+        if node.state == LISTED:
+            self.directory_released.emit(node.path())
+        node.pending = []
+        node.state = UNLISTED
+
+    # --- refresh ---
+
+    def find(self, path):
+        # the node of an already listed directory, None if it is not in the tree
+        if not self._root.children:
+            return None
+        node = self._root.children[0]
+        rel = os.path.relpath(path, node.name)
+        if rel == ".":
+            return node
+        if rel.startswith(".."):
+            return None
+        for part in rel.split(os.sep):
+            node = next((c for c in node.children if c.is_dir and c.name == part), None)
+            if node is None:
+                return None
+        return node
+
+    def refresh(self, path):
+        # list a directory again and apply only the difference to its rows
+        node = self.find(path)
+        if node is None or node.state != LISTED:
+            return
+        self._next_request += 1
+        self._refreshes[self._next_request] = (node, [])
+        self._pool.start(LoadDirTask(self._next_request, path, self._signals))
+
+    def _is_attached(self, node):
+        while node.parent is not None:
+            siblings = node.parent.children
+            if node.row >= len(siblings) or siblings[node.row] is not node:
+                return False
+            node = node.parent
+        return node is self._root
+
+    def _release_subtree(self, node):
+        # listings still running for the subtree must not insert rows under
+        # nodes that are no longer in the model
+        listing = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.is_dir and node.state == LISTED:
+                self.directory_released.emit(node.path())
+            elif node.state == LISTING:
+                listing.add(node)
+            node.state = UNLISTED
+            stack.extend(node.children)
+        if listing:
+            for request, pending_node in list(self._requests.items()):
+                if pending_node in listing:
+                    del self._requests[request]
+
+    def _apply_listing(self, node, entries):
+        parent = self._index_of(node)
+        kids = node.children
+        wanted = set(entries)
+        removed_rows = [row for row, c in enumerate(kids) if (c.name, c.is_dir) not in wanted]
+
+        # rows past the last one handed to the view stay pending
+        limit = _sort_key(kids[-1].name, kids[-1].is_dir) if node.pending and kids else None
+        present = {(c.name, c.is_dir) for c in kids}
+        fresh = [e for e in entries if e not in present and (limit is None or _sort_key(*e) < limit)]
+        pending = [e for e in entries if limit is not None and _sort_key(*e) > limit]
+
+        removed_runs = _runs(removed_rows)
+        if len(removed_runs) > self.MAX_ROW_RUNS or len(fresh) > self.MAX_ROW_RUNS * 64:
+            self._relayout(node, parent, fresh, removed_rows)
+            node.pending = pending
+            return
+
+        for run in reversed(removed_runs):
+            first, last = run[0], run[-1]
+            self.beginRemoveRows(parent, first, last)
+            for child in kids[first:last + 1]:
+                self._release_subtree(child)
+            del kids[first:last + 1]
+            for row in range(first, len(kids)):
+                kids[row].row = row
+            self.endRemoveRows()
+
+        keys = [_sort_key(c.name, c.is_dir) for c in kids]
+        inserts = [(bisect_left(keys, _sort_key(*e)), e) for e in fresh]
+        runs = [(pos, [e for _, e in g]) for pos, g in groupby(inserts, key=lambda item: item[0])]
+        if len(runs) > self.MAX_ROW_RUNS:
+            self._relayout(node, parent, fresh, [])
+        else:
+            offset = 0
+            for pos, group in runs:
+                row = pos + offset
+                self.beginInsertRows(parent, row, row + len(group) - 1)
+                kids[row:row] = [FileNode(node, name, is_dir, 0) for name, is_dir in group]
+                for r in range(row, len(kids)):
+                    kids[r].row = r
+                self.endInsertRows()
+                offset += len(group)
+        node.pending = pending
+
+    def _relayout(self, node, parent, fresh, removed_rows):
+        # many scattered changes: rebuild the row list once and move the
+        # persistent indexes (expanded / selected rows) along
+        self.layoutAboutToBeChanged.emit([QPersistentModelIndex(parent)])
+        removed = set(removed_rows)
+        for row in removed_rows:
+            self._release_subtree(node.children[row])
+        kept = [c for row, c in enumerate(node.children) if row not in removed]
+        kept.extend(FileNode(node, name, is_dir, 0) for name, is_dir in fresh)
+        kept.sort(key=lambda c: _sort_key(c.name, c.is_dir))
+        for row, child in enumerate(kept):
+            child.row = row
+        node.children = kept
+
+        old = self.persistentIndexList()
+        new = []
+        for index in old:
+            child = index.internalPointer()
+            new.append(self.createIndex(child.row, 0, child) if self._is_attached(child) else QModelIndex())
+        self.changePersistentIndexList(old, new)
+        self.layoutChanged.emit([QPersistentModelIndex(parent)])
+
 
 class FileExplorerQt(QWidget):
     def __init__(self, parent=None, open_file_callback=None):
         super().__init__(parent)
         self.open_file_callback = open_file_callback
-        self._threads = []
+        self.root_path = None
 
         layout = QVBoxLayout()
         self.setLayout(layout)
 
-        self.tree = QTreeWidget()
+        self.model = FileTreeModel(self)
+        self.tree = QTreeView()
+        self.tree.setModel(self.model)
         self.tree.setHeaderHidden(True)
-        self.tree.itemExpanded.connect(self.on_expand)
-        self.tree.itemClicked.connect(self.on_click)
+        self.tree.setUniformRowHeights(True)
+        self.tree.clicked.connect(self.on_click)
+        self.tree.collapsed.connect(self.model.release)
         layout.addWidget(self.tree)
 
-    def load_directory(self, folder_path):
-        self.tree.clear()
-
-        root_name = f"📁 {os.path.basename(folder_path)}"
-        root_item = QTreeWidgetItem([root_name])
-        root_item.setData(0, Qt.UserRole, folder_path)  # lưu path
-        self.tree.addTopLevelItem(root_item)
+        # listed directories are watched, bursts of changes are coalesced
+        # into one refresh per directory
+        self.watcher = FileWatcher(self)
+        self.model.directory_listed.connect(self.watcher.watch_directory)
+        self.model.directory_released.connect(self.watcher.unwatch_directory)
+        self.watcher.directories_changed.connect(self._on_directories_changed)
 
-        # add dummy child để lazy load
-        dummy = QTreeWidgetItem(["dummy"])
-        root_item.addChild(dummy)
+    def load_directory(self, folder_path):
+        self.root_path = folder_path
+        self.watcher.clear()
+        self.model.set_root_path(folder_path)
 
-    def on_expand(self, item):
-        path = item.data(0, Qt.UserRole)
-        if not path or not os.path.isdir(path):
-            return
+    def _on_directories_changed(self, paths):
+        for path in paths:
+            self.model.refresh(path)
 
-        # lazy load
-        if item.childCount() == 1 and item.child(0).text(0) == "dummy":
-            item.takeChild(0)  # remove dummy
-            thread = LoadDirThread(path)
-            thread.update_items.connect(lambda nodes, parent=item: self._insert_nodes(parent, nodes))
-            thread.finished.connect(lambda: self._threads.remove(thread))
-            self._threads.append(thread)
-            thread.start()
-
-    def _insert_nodes(self, parent, nodes):
-        for display_name, full_path, is_dir in nodes:
-            child = QTreeWidgetItem([display_name])
-            child.setData(0, Qt.UserRole, full_path)  # lưu path
-            parent.addChild(child)
-            if is_dir:
-                dummy = QTreeWidgetItem(["dummy"])
-                child.addChild(dummy)
-
-    def on_click(self, item, column):
-        path = item.data(0, Qt.UserRole)
-        if path and os.path.isfile(path) and self.open_file_callback:
+    def on_click(self, index):
+        path = self.model.path(index)
+        if not self.model.is_dir(index) and os.path.isfile(path) and self.open_file_callback:
             self.open_file_callback(path)
 
     def set_theme(self, dark_mode):
         if dark_mode:
             self.setStyleSheet("""
-                QTreeWidget { background-color: #2d2d2d; color: #d4d4d4; }
-                QTreeWidget::item:selected { background-color: #3e598b; color: white; }
+                QTreeView { background-color: #2d2d2d; color: #d4d4d4; }
+                QTreeView::item:selected { background-color: #3e598b; color: white; }
             """)
         else:
             self.setStyleSheet("""
-                QTreeWidget { background-color: white; color: black; }
-                QTreeWidget::item:selected { background-color: #cce8ff; color: black; }
+                QTreeView { background-color: white; color: black; }
+                QTreeView::item:selected { background-color: #cce8ff; color: black; }
             """)
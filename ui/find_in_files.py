@@ -0,0 +1,188 @@
+from PyQt5.QtWidgets import (
+    QWidget, QLineEdit, QCheckBox, QPushButton, QLabel, QListView,
+    QVBoxLayout, QHBoxLayout, QMessageBox
+)
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+import os
+import re
+
+from features.search_engine import build_pattern
+from features.project_search import ProjectSearchThread
+
+
+class SearchResultsModel(QAbstractListModel):
+    # one row per hit, rows are only turned into text when the view paints them
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = ""
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path, line, column, length, preview = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{os.path.relpath(path, self.root)}:{line}:  {preview.strip()}"
+        if role == Qt.ToolTipRole:
+            return path
+        return None
+
+    def clear(self, root=""):
+        self.beginResetModel()
+        self.root = root
+        self.rows = []
+        self.endResetModel()
+
+    def append_results(self, results, limit):
+        rows = []
+        for path, hits in results:
+            rows.extend((path, line, column, length, preview) for line, column, length, preview in hits)
+        rows = rows[:max(0, limit - len(self.rows))]
+        if rows:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+
+
+class FindInFilesPanel(QWidget):
+    # results past this are dropped and the search is stopped
+    MAX_RESULTS = 100000
+
+    def __init__(self, app, parent=None):
+        super().__init__(parent)
+        self.app = app
+        self._job_id = 0
+        self._threads = []
+        self._thread = None
+
+        self.find_entry = QLineEdit()
+        self.find_entry.setPlaceholderText("Find in files")
+        self.match_case_cb = QCheckBox("Match case")
+        self.whole_word_cb = QCheckBox("Whole word")
+        self.regex_cb = QCheckBox("Regex")
+        self.search_btn = QPushButton("Search")
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.status_label = QLabel("")
+
+        self.model = SearchResultsModel(self)
+        self.results_view = QListView()
+        self.results_view.setModel(self.model)
+        self.results_view.setUniformItemSizes(True)
+        self.results_view.setEditTriggers(QListView.NoEditTriggers)
+
+        top = QHBoxLayout()
+        top.addWidget(self.find_entry, 1)
+        top.addWidget(self.match_case_cb)
+        top.addWidget(self.whole_word_cb)
+        top.addWidget(self.regex_cb)
+        top.addWidget(self.search_btn)
+        top.addWidget(self.cancel_btn)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(4, 4, 4, 4)
+        layout.addLayout(top)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.results_view, 1)
+        self.setLayout(layout)
+
+        self.find_entry.returnPressed.connect(self.start_search)
+        self.search_btn.clicked.connect(self.start_search)
+        self.cancel_btn.clicked.connect(self.cancel_search)
+        self.results_view.activated.connect(self.open_result)
+
+    def search_root(self):
+        return self.app.explorer_frame.root_path
+
+    def start_search(self):
+        self.cancel_search()
+        query = self.find_entry.text()
+        root = self.search_root()
+        if not query:
+            return
+        if not root:
+            QMessageBox.information(self, "Find in Files", "Open a folder first (File > Open Folder).")
+            return
+        try:
+            pattern = build_pattern(
+                query,
+                regex=self.regex_cb.isChecked(),
+                whole_word=self.whole_word_cb.isChecked(),
+                match_case=self.match_case_cb.isChecked(),
+            )
+        except re.error as e:
+            self.status_label.setText(f"Invalid pattern: {e}")
+            return
+
+        # with a trigram index only the candidate files are read, plus the
+        # changed files of directories changed since the index was built
+        paths = None
+        index = self.app.search_index
+        if index is not None and index.covers(root):
+            paths = index.candidates(pattern)
+        if paths is None:
+            index = None
+
+        self.model.clear(root)
+        self.status_label.setText("Searching..." if paths is None else f"Searching {len(paths)} indexed candidates...")
+        self.cancel_btn.setEnabled(True)
+
+        thread = ProjectSearchThread(self._job_id, root, pattern, paths, index, self.app.search_index_changes)
+        thread.results_found.connect(self._on_results_found)
+        thread.progress.connect(self._on_progress)
+        thread.search_finished.connect(self._on_search_finished)
+        thread.finished.connect(lambda: self._threads.remove(thread))
+        self._threads.append(thread)
+        self._thread = thread
+        thread.start()
+
+    def cancel_search(self):
+        self._job_id += 1
+        for thread in self._threads:
+            thread.cancel()
+        if self._thread is not None:
+            self._thread = None
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText(f"Cancelled, {len(self.model.rows)} results")
+
+    def _on_results_found(self, job_id, results):
+        if job_id != self._job_id:
+            return
+        self.model.append_results(results, self.MAX_RESULTS)
+        if len(self.model.rows) >= self.MAX_RESULTS:
+            self.cancel_search()
+            self.status_label.setText(f"Stopped at the first {self.MAX_RESULTS} results")
+
+    def _on_progress(self, job_id, files_done, files_found):
+        if job_id == self._job_id:
+            self.status_label.setText(f"Searching... {files_done}/{files_found} files, {len(self.model.rows)} results")
+
+    def _on_search_finished(self, job_id, files_done, hits):
+        if job_id != self._job_id:
+            return
+        self._thread = None
+        self.cancel_btn.setEnabled(False)
+        self.status_label.setText(f"{hits} results in {files_done} files")
+        # pick up files changed since the index was last refreshed
+        self.app.refresh_search_index()
+
+    def open_result(self, index):
+        path, line, column, length, _ = self.model.rows[index.row()]
+        self.app.open_file_from_explorer(path)
+        self.app.go_to_line(line, column, length)
+
+    def set_theme(self, dark_mode):
+        if dark_mode:
+            self.setStyleSheet("""
+                QWidget { background-color: #2d2d2d; color: #d4d4d4; }
+                QListView::item:selected { background-color: #3e598b; color: white; }
+            """)
+        else:
+            self.setStyleSheet("""
+                QWidget { background-color: white; color: black; }
+                QListView::item:selected { background-color: #cce8ff; color: black; }
+            """)
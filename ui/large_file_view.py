@@ -0,0 +1,230 @@
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QPlainTextEdit, QScrollBar
+from PyQt5.QtCore import Qt, QThread, QEvent, pyqtSignal
+from array import array
+from bisect import bisect_right
+from features.file_loader import CHUNK_SIZE, DECODE_ERRORS, detect_encoding
+import codecs
+import mmap
+import os
+
+CHECKPOINT_BYTES = 1 << 20
+
+# lines are sliced out of the middle of the file, so the BOM codecs are
+# replaced by the byte order their BOM names
+BOM_CODECS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+
+class MappedTextFile:
+    # Read-only, memory-mapped text file. Instead of one offset per line the
+    # index keeps a (line, byte offset) checkpoint roughly every megabyte,
+    # lines in between are found with mmap.find when a page is read.
+    # Without an `encoding` it is detected like for any other file.
+    def __init__(self, file_path, encoding=None):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.encoding = encoding or detect_encoding(self._mm[:CHUNK_SIZE], final=self.size <= CHUNK_SIZE)
+
+        self._codec = self.encoding
+        start = 0
+        if self.encoding in ("utf-8-sig", "utf-16", "utf-32") or self.encoding.endswith("-bom"):
+            for bom, codec in BOM_CODECS:
+                if self._mm[:4].startswith(bom):
+                    self._codec, start = codec, len(bom)
+                    break
+        self._newline = "\n".encode(self._codec)
+        self._unit = len(self._newline)
+        self._start = start
+
+        self._lines = array("Q", [0])
+        self._offsets = array("Q", [start])
+        self.indexed_lines = 1
+        self.complete = self.size == 0
+
+    def _find_newline(self, pos, end=None, reverse=False):
+        # in UTF-16/32 the newline bytes only count at a code unit boundary
+        mm, newline, unit = self._mm, self._newline, self._unit
+        end = self.size if end is None else end
+        while True:
+            nl = mm.rfind(newline, pos, end) if reverse else mm.find(newline, pos, end)
+            if nl < 0 or (nl - self._start) % unit == 0:
+                return nl
+            if reverse:
+                end = nl + unit - 1
+            else:
+                pos = nl + 1
+
+    def _count_newlines(self, start, end):
+        if self._unit == 1:
+            return self._mm[start:end].count(b"\n")
+        return self._mm[start:end].decode(self._codec, "replace").count("\n")
+
+    def build_index(self, progress=None, is_cancelled=None):
+        pos = self._start
+        line = 0
+        while pos < self.size:
+            if is_cancelled and is_cancelled():
+                return
+            end = min(pos + CHECKPOINT_BYTES, self.size)
+            nl = self._find_newline(pos, end, reverse=True)
+            if nl < 0:
+                pos = end
+                continue
+            line += self._count_newlines(pos, nl + self._unit)
+            pos = nl + self._unit
+            # the GUI thread bisects _lines and then indexes _offsets, so
+            # _offsets must never be the shorter one
+            self._offsets.append(pos)
+            self._lines.append(line)
+            self.indexed_lines = line + 1
+            if progress:
+                progress(self.indexed_lines)
+        self.complete = True
+
+    def _line_offset(self, line_no):
+        i = bisect_right(self._lines, line_no) - 1
+        line, pos = self._lines[i], self._offsets[i]
+        while line < line_no:
+            nl = self._find_newline(pos)
+            if nl < 0:
+                return self.size
+            pos = nl + self._unit
+            line += 1
+        return pos
+
+    def read_lines(self, first, count):
+        start = self._line_offset(first)
+        end = start
+        for _ in range(count):
+            nl = self._find_newline(end)
+            if nl < 0:
+                end = self.size
+                break
+            end = nl + self._unit
+        return self._mm[start:end].decode(self._codec, DECODE_ERRORS).rstrip("\n")
+
+    def close(self):
+        if self.size:
+            self._mm.close()
+        self._file.close()
+
+
+class IndexThread(QThread):
+    progress = pyqtSignal(int)
+
+    def __init__(self, mapped_file):
+        super().__init__()
+        self.mapped_file = mapped_file
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        self.mapped_file.build_index(self.progress.emit, lambda: self._cancelled)
+
+
+class LargeFileView(QWidget):
+    # emits (known line count, index complete)
+    line_count_changed = pyqtSignal(int, bool)
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.mapped_file = MappedTextFile(file_path)
+        self.top_line = 0
+        self._closed = False
+
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        self.setLayout(layout)
+
+        # only a window of lines ever lives in the document
+        self.text_area = QPlainTextEdit()
+        self.text_area.setReadOnly(True)
+        self.text_area.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.text_area.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.text_area.installEventFilter(self)
+        self.text_area.viewport().installEventFilter(self)
+        layout.addWidget(self.text_area)
+
+        self.scroll_bar = QScrollBar(Qt.Vertical)
+        self.scroll_bar.setRange(0, 0)
+        self.scroll_bar.valueChanged.connect(self.scroll_to_line)
+        layout.addWidget(self.scroll_bar)
+
+        self._index_thread = IndexThread(self.mapped_file)
+        self._index_thread.progress.connect(self._on_index_progress)
+        self._index_thread.finished.connect(self._on_index_finished)
+        self._index_thread.start()
+
+    def visible_lines(self):
+        spacing = max(1, self.text_area.fontMetrics().lineSpacing())
+        return max(1, self.text_area.viewport().height() // spacing)
+
+    def scroll_to_line(self, line):
+        if self._closed:
+            return
+        self.top_line = max(0, line)
+        h_value = self.text_area.horizontalScrollBar().value()
+        self.text_area.setPlainText(self.mapped_file.read_lines(self.top_line, self.visible_lines() + 1))
+        self.text_area.horizontalScrollBar().setValue(h_value)
+
+    def _update_range(self):
+        self.scroll_bar.setPageStep(self.visible_lines())
+        self.scroll_bar.setMaximum(max(0, self.mapped_file.indexed_lines - self.visible_lines()))
+
+    def _on_index_progress(self, lines):
+        self._update_range()
+        self.line_count_changed.emit(lines, False)
+
+    def _on_index_finished(self):
+        self._update_range()
+        self.line_count_changed.emit(self.mapped_file.indexed_lines, self.mapped_file.complete)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Wheel:
+            steps = event.angleDelta().y() // 40
+            self.scroll_bar.setValue(self.scroll_bar.value() - steps)
+            return True
+        if event.type() == QEvent.KeyPress and obj is self.text_area:
+            key = event.key()
+            page = self.visible_lines()
+            moves = {
+                Qt.Key_PageDown: page, Qt.Key_PageUp: -page,
+                Qt.Key_Down: 1, Qt.Key_Up: -1,
+            }
+            if key in moves:
+                self.scroll_bar.setValue(self.scroll_bar.value() + moves[key])
+                return True
+            if key == Qt.Key_Home and event.modifiers() & Qt.ControlModifier:
+                self.scroll_bar.setValue(0)
+                return True
+            if key == Qt.Key_End and event.modifiers() & Qt.ControlModifier:
+                self.scroll_bar.setValue(self.scroll_bar.maximum())
+                return True
+        return super().eventFilter(obj, event)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_range()
+        self.scroll_to_line(self.top_line)
+
+    def set_theme(self, dark_mode):
+        if dark_mode:
+            self.text_area.setStyleSheet("background-color:#1e1e1e; color:#d4d4d4")
+        else:
+            self.text_area.setStyleSheet("background-color:white; color:black")
+
+    def close_file(self):
+        self._closed = True
+        self._index_thread.cancel()
+        self._index_thread.wait()
+        self.mapped_file.close()